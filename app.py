@@ -3,6 +3,9 @@ from config import Config
 from flask_cors import CORS
 from extensions import db, migrate, bcrypt, jwt
 from seed_data import seed_cli 
+from bench import bench_cli
+from scheduler import scheduler_cli
+from jobs import jobs_cli
 from routes.progress import progress_bp
 
 
@@ -17,6 +20,9 @@ migrate.init_app(app, db)   # 👈 обязательно!
 bcrypt.init_app(app)
 jwt.init_app(app)
 app.cli.add_command(seed_cli)
+app.cli.add_command(bench_cli)
+app.cli.add_command(scheduler_cli)
+app.cli.add_command(jobs_cli)
 @app.route("/")
 def home():
     return "Flask работает!"
@@ -36,6 +42,9 @@ app.register_blueprint(repetition_bp, url_prefix="/repetition")
 from routes.progress import progress_bp
 app.register_blueprint(progress_bp, url_prefix="/progress")
 
+from routes.sync import sync_bp
+app.register_blueprint(sync_bp, url_prefix="/sync")
+
 if __name__ == "__main__":
     app.run(debug=True)
 
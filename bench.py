@@ -0,0 +1,480 @@
+import csv
+import sys
+import time
+from datetime import date, timedelta
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import create_access_token
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func
+from extensions import db
+from models import Flashcard, RepetitionSchedule
+from utils import clock, fsrs
+from utils.daily_queue import DAILY_QUEUE_SIZE
+from utils.load_balance import best_offsets
+from utils.scheduler import SM2Scheduler, FSRSScheduler
+from utils.sm2 import SM2, RELEARN, fuzz_days, sm2_update_batch
+from utils.stats import counter_deltas
+
+# Создаем группу команд 'bench'
+bench_cli = AppGroup('bench', help='Benchmarks and performance checks.')
+
+
+def _random_states(cards, seed):
+    rng = np.random.default_rng(seed)
+    repetitions = rng.integers(0, 12, cards)
+    efactor = np.round(rng.uniform(1.3, 3.0, cards), 2)
+    interval = rng.integers(1, 400, cards)
+    quality = rng.integers(0, 6, cards)
+    return repetitions, efactor, interval, quality
+
+
+# Эталон для `flask bench sm2`: SM-2 в том виде, в каком он был до векторизации, —
+# utils/sm2.sm2_update и расчёт в POST /repetition/grade, перенесённые дословно
+# (только date.today() заменён параметром today). Меняется только вместе с
+# осознанным изменением алгоритма, не вслед за sm2_update_batch.
+def _baseline_sm2_update(repetitions, efactor, interval, quality, today):
+    if quality < 3:
+        repetitions = 0
+        interval = 1
+    else:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * efactor)
+        repetitions += 1
+
+    efactor = efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if efactor < 1.3:
+        efactor = 1.3
+
+    next_review_date = today + timedelta(days=interval)
+    return repetitions, efactor, interval, next_review_date
+
+
+def _baseline_grade(repetitions, efactor, interval, quality, today):
+    # Логика SuperMemo-2
+    if quality >= 3:
+        # Успешное повторение
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = int(interval * efactor)
+
+        repetitions += 1
+        # Обновляем E-Factor (стандартная формула)
+        efactor = max(1.3, efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+
+        # Планируем следующее повторение в будущем
+        next_review_date = today + timedelta(days=interval)
+
+    else: # quality < 3 (Не знаю / Тяжело)
+        # Неуспешное повторение: сброс, но оставляем доступной СЕГОДНЯ
+        repetitions = 1
+        interval = 1
+        efactor = max(1.3, efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+        next_review_date = today
+    return repetitions, efactor, interval, next_review_date
+
+
+BASELINE_SM2 = {SM2: _baseline_sm2_update, RELEARN: _baseline_grade}
+
+
+@bench_cli.command('sm2')
+@click.option('--cards', default=1_000_000, show_default=True, help='Размер пачки для векторного SM-2.')
+@click.option('--scalar-cards', default=100_000, show_default=True, help='Сколько карточек прогнать скалярной версией.')
+@click.option('--seed', default=42, show_default=True)
+def bench_sm2(cards, scalar_cards, seed):
+    """Стоимость SM-2 на карточку: sm2_update_batch против скалярного цикла.
+
+    Заодно сверяет векторный результат с исходной скалярной реализацией
+    (BASELINE_SM2) для обеих политик; при расхождении завершается с ненулевым кодом.
+    """
+    today = clock.today()
+    repetitions, efactor, interval, quality = _random_states(cards, seed)
+    scalar_cards = min(scalar_cards, cards)
+
+    for policy in (SM2, RELEARN):
+        start = time.perf_counter()
+        result = sm2_update_batch(repetitions, efactor, interval, quality, today=today, policy=policy)
+        batch_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        baseline = BASELINE_SM2[policy]
+        reference = [
+            baseline(int(r), float(e), int(i), int(q), today)
+            for r, e, i, q in zip(
+                repetitions[:scalar_cards], efactor[:scalar_cards],
+                interval[:scalar_cards], quality[:scalar_cards]
+            )
+        ]
+        scalar_seconds = time.perf_counter() - start
+
+        mismatches = sum(
+            1 for n, expected in enumerate(reference)
+            if (
+                int(result[0][n]), float(result[1][n]), int(result[2][n]), result[3][n].astype(date)
+            ) != expected
+        )
+
+        click.echo(
+            f"{policy:8s} batch: {cards} карточек за {batch_seconds:.3f} с "
+            f"({batch_seconds / cards * 1e9:.1f} нс/карточку); "
+            f"scalar: {scalar_seconds / scalar_cards * 1e9:.1f} нс/карточку; "
+            f"расхождений: {mismatches} из {scalar_cards}"
+        )
+        if mismatches:
+            sys.exit(1)
+
+
+# Горячие GET-маршруты, планы запросов которых проверяет `flask bench explain`.
+# {card_id}, {card_ids}, {category_id} подставляются из данных пользователя,
+# {cursor} — курсор после полной синхронизации (проверяется обычная, не первая).
+EXPLAIN_ENDPOINTS = [
+    "/repetition/today",
+    "/repetition/today?category_id={category_id}",
+    "/repetition/next",
+    "/flashcards?limit=50",
+    "/flashcards?ids={card_ids}",
+    "/flashcards/{card_id}",
+    "/flashcards/categories",
+    "/flashcards/search?q=haus",
+    "/progress/stats",
+    "/progress/chart_data",
+    "/progress/history",
+    "/sync/changes?since={cursor}",
+]
+
+
+class _ConnectionSession(Session):
+    """Сессия на внешнем соединении (bind): Session Flask-SQLAlchemy
+    выбирает engine по модели и переданный bind не учитывает."""
+
+    def get_bind(self, *args, **kwargs):
+        return self.bind
+
+
+def _seq_scans(plan):
+    """Имена таблиц, которые план читает последовательным сканированием."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+@bench_cli.command('explain')
+@click.option('--user-id', type=int, default=None, help='Чьи данные использовать (по умолчанию — с наибольшим числом расписаний).')
+@click.option('--min-rows', default=10_000, show_default=True, help='Seq Scan по таблице меньше этого (по оценке планировщика) не считается ошибкой.')
+def bench_explain(user_id, min_rows):
+    """EXPLAIN всех SELECT горячих маршрутов с настройками планировщика по умолчанию.
+
+    Маршруты вызываются через тестовый клиент, их SQL перехватывается.
+    Seq Scan по таблице от --min-rows строк — регрессия (индекса нет или
+    планировщик им не пользуется), и команда завершается с ненулевым кодом;
+    по маленьким таблицам он только выводится. Всё выполняется в одной
+    транзакции, которая откатывается: коммиты маршрутов (/today и /next
+    создают расписания) становятся точками сохранения внутри неё.
+    """
+    if user_id is None:
+        user_id = db.session.query(RepetitionSchedule.user_id).group_by(
+            RepetitionSchedule.user_id
+        ).order_by(func.count().desc()).limit(1).scalar()
+    if user_id is None:
+        raise click.ClickException("В базе нет расписаний: сначала заполните её")
+
+    card_ids = [
+        row.flashcard_id for row in db.session.query(RepetitionSchedule.flashcard_id).filter(
+            RepetitionSchedule.user_id == user_id
+        ).order_by(RepetitionSchedule.flashcard_id).limit(20)
+    ]
+    category_id = db.session.query(Flashcard.category_id).filter(
+        Flashcard.id.in_(card_ids), Flashcard.category_id.isnot(None)
+    ).limit(1).scalar()
+    values = {
+        "card_id": card_ids[0],
+        "card_ids": ",".join(map(str, card_ids)),
+        "category_id": category_id or 0,
+    }
+    db.session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    client = current_app.test_client()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    failures = 0
+    app_session = db.session
+    with db.engine.connect() as conn:
+        transaction = conn.begin()
+        db.session = db._make_scoped_session({
+            "class_": _ConnectionSession, "bind": conn, "join_transaction_mode": "create_savepoint",
+        })
+        try:
+            cursor, has_more = 0, True
+            while has_more:
+                body = client.get(f"/sync/changes?since={cursor}", headers=headers).get_json()
+                cursor, has_more = body["cursor"], body["has_more"]
+            values["cursor"] = cursor
+
+            for template in EXPLAIN_ENDPOINTS:
+                url = template.format(**values)
+                captured.clear()
+                event.listen(db.engine, "before_cursor_execute", capture)
+                try:
+                    status = client.get(url, headers=headers).status_code
+                finally:
+                    event.remove(db.engine, "before_cursor_execute", capture)
+
+                problems, small = [], set()
+                for statement, parameters in captured:
+                    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+                    for table in _seq_scans(plan[0]["Plan"]):
+                        rows = conn.exec_driver_sql(
+                            "SELECT reltuples FROM pg_class WHERE oid = %(table)s::regclass", {"table": table}
+                        ).scalar()
+                        if rows >= min_rows:
+                            problems.append((table, rows, " ".join(statement.split())[:200]))
+                        else:
+                            small.add(table)
+
+                if problems or status >= 400:
+                    failures += 1
+                click.echo(f"{'FAIL' if problems or status >= 400 else 'ok':4s} {url} [{status}] запросов: {len(captured)}")
+                for table, rows, statement in problems:
+                    click.echo(f"     Seq Scan on {table} (~{rows:.0f} строк): {statement}")
+                if small:
+                    click.echo(f"     (Seq Scan по таблицам меньше --min-rows: {', '.join(sorted(small))})")
+        finally:
+            db.session.remove()
+            db.session = app_session
+            transaction.rollback()
+
+    if failures:
+        sys.exit(1)
+
+
+# Записей в БД на любой ответ: UPDATE repetition_schedule, INSERT review_logs,
+# UPSERT quiz_results. POST /repetition/result (политика sm2) ещё пишет строку
+# user_counter_deltas, если ответ меняет счётчики, — считается по counter_deltas
+WRITES_PER_REVIEW = 3
+# Сколько раз за день карточка с ошибкой возвращается в сессию (политика relearn)
+RELEARN_PASSES = 3
+# Оценки при верном ответе (3 — трудно, 4 — хорошо, 5 — легко) и при ошибке (0–2)
+RECALL_QUALITY = ([3, 4, 5], [0.15, 0.7, 0.15])
+FORGET_QUALITY = ([0, 1, 2], [0.3, 0.3, 0.4])
+
+
+class _Simulation:
+    """Карточки всех синтетических пользователей в плоских массивах.
+
+    Карточка k пользователя u — элемент u * deck + k. "Память" пользователя
+    моделируется FSRS с параметрами по умолчанию: вероятность вспомнить
+    зависит от прошедших дней, а не от выбранного алгоритма интервалов.
+    """
+
+    def __init__(self, users, deck, scheduler, start, rng):
+        size = users * deck
+        self.users, self.deck, self.scheduler, self.rng = users, deck, scheduler, rng
+        self.owner = np.repeat(np.arange(users), deck)
+        self.introduced = np.zeros(users, dtype=np.int64)
+        self.state = {
+            "repetitions": np.zeros(size, dtype=np.int64),
+            "efactor": np.full(size, 2.5),
+            "interval": np.ones(size, dtype=np.int64),
+            "stability": np.full(size, np.nan),
+            "difficulty": np.full(size, np.nan),
+            "last_review_date": np.full(size, np.datetime64("NaT"), dtype="datetime64[D]"),
+            "next_review_date": np.full(size, np.datetime64(start, "D") + np.timedelta64(10 ** 5, "D")),
+        }
+        self.memory_w = fsrs.weights(fsrs.DEFAULT_PARAMS)
+        self.memory_stability = np.zeros(size)
+        self.memory_difficulty = np.zeros(size)
+        self.memory_last = np.zeros(size, dtype="datetime64[D]")
+
+    def introduce(self, counts, today):
+        """Новые карточки: count на пользователя, доступны сегодня. Возвращает их индексы."""
+        counts = np.minimum(counts, self.deck - self.introduced)
+        first = np.arange(self.users) * self.deck + self.introduced
+        cards = np.repeat(first, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+        self.introduced += counts
+        self.state["next_review_date"][cards] = today
+        return cards
+
+    def grade(self, cards, today, new):
+        """Оценки, которые синтетический пользователь ставит карточкам cards."""
+        elapsed = (today - self.memory_last[cards]).astype(np.float64)
+        recall = fsrs.retrievability(elapsed, np.where(new, 1.0, self.memory_stability[cards]))
+        recalled = np.where(new, self.rng.random(len(cards)) < 0.6, self.rng.random(len(cards)) < recall)
+        quality = np.where(
+            recalled,
+            self.rng.choice(RECALL_QUALITY[0], len(cards), p=RECALL_QUALITY[1]),
+            self.rng.choice(FORGET_QUALITY[0], len(cards), p=FORGET_QUALITY[1])
+        )
+        rating = fsrs.quality_to_rating(quality)
+        stability, difficulty, _ = fsrs.step(
+            self.memory_w, np.maximum(self.memory_stability[cards], 0.01),
+            np.clip(self.memory_difficulty[cards], 1, 10), elapsed, rating
+        )
+        init_stability, init_difficulty = fsrs.init_state(self.memory_w, rating)
+        self.memory_stability[cards] = np.where(new, init_stability, stability)
+        self.memory_difficulty[cards] = np.where(new, init_difficulty, difficulty)
+        self.memory_last[cards] = today
+        return quality
+
+    def review(self, cards, quality, load=None, horizon_start=None):
+        """Применяет алгоритм интервалов (дата ответа — clock.today()) и, если
+        передана матрица загрузки, выравнивает даты как level_due_dates.
+
+        Возвращает (карточки снова на сегодня, сколько ответов записали
+        бы строку user_counter_deltas в POST /repetition/result).
+        """
+        before = {field: values[cards] for field, values in self.state.items()}
+        result = self.scheduler.review(before, quality)
+        result.pop("elapsed_days")
+        today = np.datetime64(clock.today(), "D")
+        if load is not None:
+            _level_dates(self.owner[cards], result, today, load, horizon_start)
+        for field, values in result.items():
+            self.state[field][cards] = values
+        studying, learned = counter_deltas(before, result, quality)
+        return result["next_review_date"] <= today, int(((studying != 0) | (learned != 0)).sum())
+
+
+def _level_dates(owner, result, today, load, horizon_start):
+    """Векторный аналог utils.load_balance.level_due_dates для симуляции.
+
+    load — матрица (пользователи, дни горизонта) с числом карточек на день.
+    Карточки одного пользователя разносятся по очереди (раунд k — k-я
+    карточка каждого пользователя), чтобы каждая учитывала предыдущие.
+    """
+    passed = np.flatnonzero(result["next_review_date"] > today)
+    windows = fuzz_days(result["interval"][passed])
+    targets = (result["next_review_date"][passed] - horizon_start).astype(np.int64)
+    order = np.argsort(owner[passed], kind="stable")
+    users = owner[passed][order]
+    rank = np.arange(len(order)) - np.searchsorted(users, users)
+    ranks = np.empty_like(rank)
+    ranks[order] = rank
+    horizon = load.shape[1]
+
+    for k in range(int(ranks.max()) + 1 if len(ranks) else 0):
+        sel = np.flatnonzero((ranks == k) & (windows > 0))
+        if not len(sel):
+            continue
+        width = int(windows[sel].max())
+        columns = targets[sel, None] + np.arange(-width, width + 1)
+        inside = (columns >= 0) & (columns < horizon)
+        loads = np.where(inside, load[owner[passed][sel, None], np.clip(columns, 0, horizon - 1)], 0)
+        offsets = best_offsets(loads, windows[sel])
+        targets[sel] += offsets
+        cards = passed[sel]
+        result["interval"][cards] += offsets
+        result["next_review_date"][cards] += offsets.astype("timedelta64[D]")
+        placed = targets[sel] < horizon
+        np.add.at(load, (owner[cards][placed], targets[sel][placed]), 1)
+
+
+@bench_cli.command('simulate')
+@click.option('--users', default=1000, show_default=True, help='Синтетических пользователей.')
+@click.option('--days', default=365, show_default=True, help='Дней симуляции.')
+@click.option('--deck', default=2000, show_default=True, help='Карточек в колоде пользователя.')
+@click.option('--new-per-day', default=10.0, show_default=True, help='Среднее число новых карточек в день (Пуассон).')
+@click.option('--activity', default=0.8, show_default=True, help='Вероятность, что пользователь занимается в данный день.')
+@click.option('--daily-limit', default=DAILY_QUEUE_SIZE, show_default=True, help='Повторений на пользователя в день (очередь /today).')
+@click.option('--scheduler', 'scheduler_name', type=click.Choice(['sm2', 'fsrs']), default='sm2', show_default=True)
+@click.option('--policy', type=click.Choice([SM2, RELEARN]), default=SM2, show_default=True, help='sm2 — как /result, relearn — как /grade.')
+@click.option('--load-balance', is_flag=True, help='Выравнивание нагрузки (как LOAD_BALANCE=1).')
+@click.option('--seed', default=42, show_default=True)
+@click.option('--csv', 'csv_path', type=click.Path(dir_okay=False, writable=True), default=None, help='Записать посуточную статистику в CSV.')
+def bench_simulate(users, days, deck, new_per_day, activity, daily_limit, scheduler_name, policy, load_balance, seed, csv_path):
+    """Симуляция нагрузки повторений парка пользователей без БД.
+
+    День за днём (через utils.clock.use_today) синтетические пользователи
+    получают новые карточки, разбирают очередь до --daily-limit и ставят
+    оценки по модели памяти; интервалы считает тот же планировщик, что и
+    маршруты. Выводит по дням: активных пользователей, размер очередей,
+    число повторений, ошибок, новых карточек, записей в БД и хвост
+    непросмотренных карточек, а в конце — равномерность нагрузки.
+    """
+    rng = np.random.default_rng(seed)
+    start = clock.today()
+    scheduler = FSRSScheduler(policy) if scheduler_name == 'fsrs' else SM2Scheduler(policy)
+    sim = _Simulation(users, deck, scheduler, start, rng)
+    horizon_start = np.datetime64(start, "D")
+    columns = ["day", "active_users", "queue", "queue_p95", "reviews", "failed", "new", "writes", "backlog"]
+    rows = []
+    started = time.perf_counter()
+
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        with clock.use_today(day):
+            today = np.datetime64(clock.today(), "D")
+            load = None
+            if load_balance:
+                known = np.flatnonzero(sim.state["next_review_date"] > today)
+                columns_due = (sim.state["next_review_date"][known] - horizon_start).astype(np.int64)
+                inside = columns_due < days + 1
+                load = np.zeros((users, days + 1), dtype=np.int64)
+                np.add.at(load, (sim.owner[known][inside], columns_due[inside]), 1)
+
+            active = rng.random(users) < activity
+            due = sim.state["next_review_date"] <= today
+            queue = np.bincount(sim.owner[due], minlength=users)
+
+            # очередь активного пользователя — первые daily_limit карточек по next_review_date
+            candidates = np.flatnonzero(due & active[sim.owner])
+            candidates = candidates[np.lexsort((sim.state["next_review_date"][candidates], sim.owner[candidates]))]
+            owners = sim.owner[candidates]
+            taken = candidates[(np.arange(len(candidates)) - np.searchsorted(owners, owners)) < daily_limit]
+            new = sim.introduce(np.where(active, rng.poisson(new_per_day, users), 0), today)
+
+            cards = np.concatenate([taken, new])
+            is_new = np.concatenate([np.zeros(len(taken), dtype=bool), np.ones(len(new), dtype=bool)])
+            reviews = failed = counter_writes = 0
+            for _ in range(1 + (RELEARN_PASSES if policy == RELEARN else 0)):
+                if not len(cards):
+                    break
+                quality = sim.grade(cards, today, is_new)
+                again, changed = sim.review(cards, quality, load, horizon_start)
+                reviews += len(cards)
+                # дельты счётчиков пишет только /result (политика sm2), не /grade
+                if policy == SM2:
+                    counter_writes += changed
+                failed += int((quality < 3).sum())
+                cards, is_new = cards[again], np.zeros(int(again.sum()), dtype=bool)
+
+            backlog = int((sim.state["next_review_date"] <= today).sum())
+            row = [
+                day.isoformat(), int(active.sum()), int(queue.sum()),
+                int(np.percentile(queue[active], 95)) if active.any() else 0,
+                reviews, failed, len(new), reviews * WRITES_PER_REVIEW + counter_writes + len(new), backlog
+            ]
+            rows.append(row)
+            click.echo(" ".join(f"{column}={value}" for column, value in zip(columns, row)))
+
+    elapsed = time.perf_counter() - started
+    if csv_path:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+    # Равномерность — по второй половине симуляции, когда колоды уже набраны
+    daily = np.array([row[4] for row in rows[len(rows) // 2:]], dtype=np.float64)
+    if len(daily) and daily.mean():
+        click.echo(
+            f"повторений в день (вторая половина): среднее {daily.mean():.0f}, максимум {daily.max():.0f}, "
+            f"пик/среднее {daily.max() / daily.mean():.2f}, CV {daily.std() / daily.mean():.3f}"
+        )
+    click.echo(f"{users} пользователей x {days} дней за {elapsed:.1f} с")
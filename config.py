@@ -17,6 +17,20 @@ class Config:
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=30)  # срок жизни токена (30 дней)
 
+    # 📚 Кэш публичного каталога
+    # Как часто (сек) процесс сверяет версию каталога с БД
+    CATALOG_VERSION_TTL = int(os.getenv("CATALOG_VERSION_TTL", 5))
+    # Cache-Control: max-age для клиентов и прокси
+    CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 60))
+
+    # 🗓️ Дневная очередь: сколько секунд процесс отдаёт её из памяти, не сверяясь
+    # с БД (изменения через другие воркеры появляются не позже чем через этот срок)
+    DAILY_QUEUE_TTL = int(os.getenv("DAILY_QUEUE_TTL", 30))
+
+    # 📅 Выравнивание нагрузки: интервал слегка "размывается", и из окна
+    # выбирается день, на который у пользователя меньше всего карточек
+    LOAD_BALANCE = os.getenv("LOAD_BALANCE", "0").lower() in ("1", "true", "yes")
+
     # 🔧 Дополнительно (можно включить при необходимости)
     # PROPAGATE_EXCEPTIONS = True
 
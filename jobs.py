@@ -0,0 +1,27 @@
+import click
+from datetime import timedelta
+from flask.cli import AppGroup
+from utils.jobs import JOB_STALE_AFTER, resume_stale_jobs
+
+# Создаем группу команд 'jobs'
+jobs_cli = AppGroup('jobs', help='Background job maintenance.')
+
+
+@jobs_cli.command('resume')
+@click.option(
+    '--stale-after', default=int(JOB_STALE_AFTER.total_seconds() // 60), show_default=True,
+    help='Минут без обновления прогресса, после которых задача считается потерянной.'
+)
+def resume_command(stale_after):
+    """Возобновляет фоновые задачи, потерянные при перезапуске воркера.
+
+    Потоки задач живут внутри воркера (utils.jobs); после его перезапуска
+    задачи остаются в pending/running. Команда находит задачи без пульса
+    и выполняет их заново в этом процессе: удаление категории продолжает
+    с оставшихся карточек, импорт — со строки после последней сохранённой
+    пачки. Запускать по cron или после деплоя.
+    """
+    resumed = resume_stale_jobs(timedelta(minutes=stale_after))
+    for job_id, status in resumed:
+        click.echo(f"Задача {job_id}: {status}")
+    click.echo(f"Возобновлено задач: {len(resumed)}.")
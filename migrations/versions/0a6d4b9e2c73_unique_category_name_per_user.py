@@ -0,0 +1,57 @@
+"""Unique (user_id, name) on categories
+
+Revision ID: 0a6d4b9e2c73
+Revises: f13c8d2e6a59
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6d4b9e2c73'
+down_revision = 'f13c8d2e6a59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1. Сливаем дубликаты (одинаковое имя у одного пользователя) в категорию с min(id)
+    op.execute(text("""
+        CREATE TEMPORARY TABLE category_merge ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY user_id, name) AS keep_id FROM categories
+        ) AS ranked
+        WHERE id <> keep_id
+    """))
+    op.execute(text("""
+        UPDATE flashcards AS f SET category_id = m.keep_id
+        FROM category_merge AS m WHERE f.category_id = m.id
+    """))
+    # подписка на дубликат, если уже есть подписка на оставляемую категорию, не нужна
+    op.execute(text("""
+        DELETE FROM category_subscriptions AS s
+        USING category_merge AS m
+        WHERE s.category_id = m.id AND EXISTS (
+            SELECT 1 FROM category_subscriptions AS k
+            WHERE k.user_id = s.user_id AND k.category_id = m.keep_id
+        )
+    """))
+    op.execute(text("""
+        UPDATE category_subscriptions AS s SET category_id = m.keep_id
+        FROM category_merge AS m WHERE s.category_id = m.id
+    """))
+    op.execute(text("""
+        UPDATE categories AS c
+        SET card_count = (SELECT COUNT(*) FROM flashcards WHERE flashcards.category_id = c.id)
+        WHERE c.id IN (SELECT keep_id FROM category_merge)
+    """))
+    op.execute(text("DELETE FROM categories WHERE id IN (SELECT id FROM category_merge)"))
+
+    # 2. Ограничение уникальности (заодно индекс для поиска категории по имени)
+    op.create_unique_constraint('uq_categories_user_name', 'categories', ['user_id', 'name'])
+
+
+def downgrade():
+    op.drop_constraint('uq_categories_user_name', 'categories', type_='unique')
@@ -0,0 +1,104 @@
+"""Move card text into content-addressed card_content
+
+Revision ID: 1b9e7f3a5d86
+Revises: 0a6d4b9e2c73
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = '1b9e7f3a5d86'
+down_revision = '0a6d4b9e2c73'
+branch_labels = None
+depends_on = None
+
+# Размер пачки при переносе текстов (по диапазону flashcards.id)
+BATCH_SIZE = 10000
+
+# Должно совпадать с utils.content.content_hash()
+HASH_SQL = "sha256(convert_to({t}.front || chr(31) || {t}.back, 'UTF8'))"
+
+
+def upgrade():
+    op.create_table('card_content',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.LargeBinary(length=32), nullable=False),
+    sa.Column('front', sa.String(length=255), nullable=False),
+    sa.Column('back', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash')
+    )
+    op.add_column('flashcards', sa.Column('content_id', sa.Integer(), nullable=True))
+
+    # 1. Backfill пачками, каждая в своей транзакции: короткие блокировки,
+    # прогресс не теряется при обрыве (повторный запуск продолжит с NULL).
+    # Перенос текста — не изменение для клиентов, поэтому sync_touch отключаем.
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        conn.execute(text("ALTER TABLE flashcards DISABLE TRIGGER flashcards_sync_touch"))
+        max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM flashcards")).scalar()
+        for low in range(0, max_id, BATCH_SIZE):
+            bounds = {"low": low, "high": low + BATCH_SIZE}
+            conn.execute(text(f"""
+                INSERT INTO card_content (content_hash, front, back)
+                SELECT DISTINCT ON (h) h, front, back FROM (
+                    SELECT {HASH_SQL.format(t='f')} AS h, f.front, f.back
+                    FROM flashcards AS f
+                    WHERE f.id > :low AND f.id <= :high AND f.content_id IS NULL
+                ) AS batch
+                ON CONFLICT (content_hash) DO NOTHING
+            """), bounds)
+            conn.execute(text(f"""
+                UPDATE flashcards AS f SET content_id = c.id
+                FROM card_content AS c
+                WHERE f.id > :low AND f.id <= :high AND f.content_id IS NULL
+                  AND c.content_hash = {HASH_SQL.format(t='f')}
+            """), bounds)
+        conn.execute(text("ALTER TABLE flashcards ENABLE TRIGGER flashcards_sync_touch"))
+
+    # 2. Ссылка обязательна, дубли текста в flashcards больше не храним
+    op.alter_column('flashcards', 'content_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key('flashcards_content_id_fkey', 'flashcards', 'card_content', ['content_id'], ['id'])
+    op.create_index('ix_flashcards_content_id', 'flashcards', ['content_id'])
+    op.execute(text("DROP INDEX IF EXISTS ix_flashcards_search_trgm"))
+    op.drop_column('flashcards', 'back')
+    op.drop_column('flashcards', 'front')
+
+    # 3. Поисковый индекс — по уникальным текстам (см. routes/flashcards.py:SEARCH_TEXT)
+    op.execute(text("""
+        CREATE INDEX ix_card_content_search_trgm ON card_content
+        USING gin (f_unaccent(lower(front || ' ' || back)) gin_trgm_ops)
+    """))
+
+
+def downgrade():
+    op.add_column('flashcards', sa.Column('front', sa.String(length=255), nullable=True))
+    op.add_column('flashcards', sa.Column('back', sa.String(length=255), nullable=True))
+
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        conn.execute(text("ALTER TABLE flashcards DISABLE TRIGGER flashcards_sync_touch"))
+        max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM flashcards")).scalar()
+        for low in range(0, max_id, BATCH_SIZE):
+            conn.execute(text("""
+                UPDATE flashcards AS f SET front = c.front, back = c.back
+                FROM card_content AS c
+                WHERE f.id > :low AND f.id <= :high AND c.id = f.content_id
+            """), {"low": low, "high": low + BATCH_SIZE})
+        conn.execute(text("ALTER TABLE flashcards ENABLE TRIGGER flashcards_sync_touch"))
+
+    op.alter_column('flashcards', 'front', existing_type=sa.String(length=255), nullable=False)
+    op.alter_column('flashcards', 'back', existing_type=sa.String(length=255), nullable=False)
+    op.execute(text("DROP INDEX IF EXISTS ix_card_content_search_trgm"))
+    op.drop_index('ix_flashcards_content_id', table_name='flashcards')
+    op.drop_constraint('flashcards_content_id_fkey', 'flashcards', type_='foreignkey')
+    op.drop_column('flashcards', 'content_id')
+    op.drop_table('card_content')
+    op.execute(text("""
+        CREATE INDEX ix_flashcards_search_trgm ON flashcards
+        USING gin (user_id, f_unaccent(lower(front || ' ' || back)) gin_trgm_ops)
+    """))
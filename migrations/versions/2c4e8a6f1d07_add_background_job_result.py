@@ -0,0 +1,24 @@
+"""Add background_jobs.result
+
+Revision ID: 2c4e8a6f1d07
+Revises: 1b9e7f3a5d86
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c4e8a6f1d07'
+down_revision = '1b9e7f3a5d86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('background_jobs', sa.Column('result', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('background_jobs', 'result')
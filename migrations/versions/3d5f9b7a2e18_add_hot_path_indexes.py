@@ -0,0 +1,39 @@
+"""Add indexes for due-queue, deck and quiz history queries
+
+Revision ID: 3d5f9b7a2e18
+Revises: 2c4e8a6f1d07
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5f9b7a2e18'
+down_revision = '2c4e8a6f1d07'
+branch_labels = None
+depends_on = None
+
+# (имя, таблица, колонки, INCLUDE)
+INDEXES = [
+    ('ix_repetition_schedule_user_id_next_review_date', 'repetition_schedule', ['user_id', 'next_review_date'], ['flashcard_id']),
+    ('ix_repetition_schedule_flashcard_id', 'repetition_schedule', ['flashcard_id'], None),
+    ('ix_flashcards_user_id_id', 'flashcards', ['user_id', 'id'], None),
+    ('ix_quiz_results_user_id_date', 'quiz_results', ['user_id', 'date'], None),
+]
+
+
+def upgrade():
+    # CONCURRENTLY: таблицы не блокируются на запись во время построения
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(
+                name, table, columns, postgresql_include=include or [],
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,34 @@
+"""Add daily_queue for precomputed due lists
+
+Revision ID: 4e7a1c9d3b26
+Revises: 3d5f9b7a2e18
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7a1c9d3b26'
+down_revision = '3d5f9b7a2e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_queue',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('due_count', sa.Integer(), nullable=False),
+    sa.Column('card_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_queue')
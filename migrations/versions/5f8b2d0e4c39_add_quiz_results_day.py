@@ -0,0 +1,51 @@
+"""Add quiz_results.day with one row per user per day
+
+Revision ID: 5f8b2d0e4c39
+Revises: 4e7a1c9d3b26
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = '5f8b2d0e4c39'
+down_revision = '4e7a1c9d3b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('quiz_results', sa.Column('day', sa.Date(), nullable=True))
+    op.execute(text("UPDATE quiz_results SET day = date(date)"))
+
+    # 1. Дубли за один день (гонка старого SELECT + INSERT) сливаются в самую раннюю запись
+    op.execute(text("""
+        UPDATE quiz_results AS q SET score = d.total
+        FROM (
+            SELECT MIN(id) AS keep_id, SUM(score) AS total
+            FROM quiz_results GROUP BY user_id, day HAVING COUNT(*) > 1
+        ) AS d
+        WHERE q.id = d.keep_id
+    """))
+    op.execute(text("""
+        DELETE FROM quiz_results AS q
+        USING (
+            SELECT user_id, day, MIN(id) AS keep_id
+            FROM quiz_results GROUP BY user_id, day HAVING COUNT(*) > 1
+        ) AS d
+        WHERE q.user_id = d.user_id AND q.day = d.day AND q.id <> d.keep_id
+    """))
+
+    op.alter_column('quiz_results', 'day', existing_type=sa.Date(), nullable=False)
+    op.create_unique_constraint('uq_quiz_results_user_day', 'quiz_results', ['user_id', 'day'])
+    # Уникальный индекс (user_id, day) заменяет индекс по (user_id, date)
+    op.drop_index('ix_quiz_results_user_id_date', table_name='quiz_results', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_quiz_results_user_id_date', 'quiz_results', ['user_id', 'date'])
+    op.drop_constraint('uq_quiz_results_user_day', 'quiz_results', type_='unique')
+    op.drop_column('quiz_results', 'day')
@@ -0,0 +1,46 @@
+"""Add user_counter_deltas for append-only user counters
+
+Revision ID: 6a9c3e1f5b47
+Revises: 5f8b2d0e4c39
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a9c3e1f5b47'
+down_revision = '5f8b2d0e4c39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_counter_deltas',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('studying_delta', sa.Integer(), nullable=False),
+        sa.Column('learned_delta', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_user_counter_deltas_user_id', 'user_counter_deltas', ['user_id'])
+
+
+def downgrade():
+    # Несвёрнутые дельты переносятся в users, чтобы счётчики не потерялись
+    op.execute(sa.text("""
+        UPDATE users AS u
+        SET studying_count = GREATEST(0, u.studying_count + d.studying),
+            learned_count = GREATEST(0, u.learned_count + d.learned)
+        FROM (
+            SELECT user_id, SUM(studying_delta) AS studying, SUM(learned_delta) AS learned
+            FROM user_counter_deltas GROUP BY user_id
+        ) AS d
+        WHERE u.id = d.user_id
+    """))
+    op.drop_index('ix_user_counter_deltas_user_id', table_name='user_counter_deltas')
+    op.drop_table('user_counter_deltas')
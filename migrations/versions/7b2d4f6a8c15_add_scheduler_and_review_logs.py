@@ -0,0 +1,52 @@
+"""Add per-user scheduler, FSRS schedule state and review_logs
+
+Revision ID: 7b2d4f6a8c15
+Revises: 6a9c3e1f5b47
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2d4f6a8c15'
+down_revision = '6a9c3e1f5b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('scheduler', sa.String(length=16), server_default='sm2', nullable=False))
+    op.add_column('users', sa.Column('fsrs_params', postgresql.ARRAY(sa.Float()), nullable=True))
+
+    op.add_column('repetition_schedule', sa.Column('stability', sa.Float(), nullable=True))
+    op.add_column('repetition_schedule', sa.Column('difficulty', sa.Float(), nullable=True))
+    op.add_column('repetition_schedule', sa.Column('last_review_date', sa.Date(), nullable=True))
+
+    op.create_table(
+        'review_logs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('flashcard_id', sa.Integer(), nullable=False),
+        sa.Column('quality', sa.SmallInteger(), nullable=False),
+        sa.Column('elapsed_days', sa.Integer(), nullable=True),
+        sa.Column('reviewed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_review_logs_user_id_flashcard_id_reviewed_at', 'review_logs',
+        ['user_id', 'flashcard_id', 'reviewed_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_review_logs_user_id_flashcard_id_reviewed_at', table_name='review_logs')
+    op.drop_table('review_logs')
+    op.drop_column('repetition_schedule', 'last_review_date')
+    op.drop_column('repetition_schedule', 'difficulty')
+    op.drop_column('repetition_schedule', 'stability')
+    op.drop_column('users', 'fsrs_params')
+    op.drop_column('users', 'scheduler')
@@ -0,0 +1,50 @@
+"""Add category_subscriptions, per-user unique schedules
+
+Revision ID: 8c1d2f4a9b10
+Revises: 5054ecfab778
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d2f4a9b10'
+down_revision = '5054ecfab778'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1. Подписки пользователей на публичные наборы (вместо копирования карточек)
+    op.create_table('category_subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('scheduled_through', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'category_id', name='uq_category_subscriptions_user_category')
+    )
+
+    # 2. Публичная карточка может иметь расписание у каждого подписчика:
+    # уникальность flashcard_id заменяем на уникальность (user_id, flashcard_id)
+    with op.batch_alter_table('repetition_schedule', schema=None) as batch_op:
+        batch_op.drop_constraint('repetition_schedule_flashcard_id_key', type_='unique')
+        batch_op.create_unique_constraint('uq_repetition_schedule_user_flashcard', ['user_id', 'flashcard_id'])
+
+    # 3. Индекс для ленивого создания расписаний (category_id, id > watermark)
+    op.create_index('ix_flashcards_category_id_id', 'flashcards', ['category_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_flashcards_category_id_id', table_name='flashcards')
+
+    with op.batch_alter_table('repetition_schedule', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_repetition_schedule_user_flashcard', type_='unique')
+        batch_op.create_unique_constraint('repetition_schedule_flashcard_id_key', ['flashcard_id'])
+
+    op.drop_table('category_subscriptions')
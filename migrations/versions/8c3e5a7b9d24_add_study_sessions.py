@@ -0,0 +1,39 @@
+"""Add study_sessions for keyset-paged study sessions
+
+Revision ID: 8c3e5a7b9d24
+Revises: 7b2d4f6a8c15
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3e5a7b9d24'
+down_revision = '7b2d4f6a8c15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'study_sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('due_only', sa.Boolean(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('max_flashcard_id', sa.Integer(), nullable=False),
+        sa.Column('cursor', sa.Integer(), nullable=False),
+        sa.Column('page_size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_study_sessions_user_id', 'study_sessions', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_study_sessions_user_id', table_name='study_sessions')
+    op.drop_table('study_sessions')
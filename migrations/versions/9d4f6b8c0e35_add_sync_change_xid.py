@@ -0,0 +1,62 @@
+"""Stamp synced rows with the writing transaction id
+
+Revision ID: 9d4f6b8c0e35
+Revises: 8c3e5a7b9d24
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f6b8c0e35'
+down_revision = '8c3e5a7b9d24'
+branch_labels = None
+depends_on = None
+
+SYNC_TABLES = ['categories', 'flashcards', 'repetition_schedule', 'category_subscriptions', 'sync_tombstones']
+
+CURRENT_XID = "pg_current_xact_id()::text::bigint"
+
+
+def upgrade():
+    # 1. change_xid — номер транзакции, записавшей строку. GET /sync/changes
+    # отдаёт только строки с change_xid ниже xmin своего снимка: все такие
+    # транзакции уже завершены, и курсор не может обогнать незакоммиченную запись.
+    # Существующие строки получают 0 (без перезаписи таблиц): клиенты со старым
+    # курсором и так проходят полную синхронизацию.
+    for table in SYNC_TABLES:
+        op.add_column(table, sa.Column('change_xid', sa.BigInteger(), server_default='0', nullable=False))
+        op.alter_column(table, 'change_xid', server_default=sa.text(CURRENT_XID))
+        op.create_index(f'ix_{table}_user_id_change_xid', table, ['user_id', 'change_xid'])
+    op.create_index('ix_flashcards_category_id_change_xid', 'flashcards', ['category_id', 'change_xid'])
+
+    # 2. Триггер: номер транзакции на каждую вставку/обновление
+    # (tombstones получают его значением по умолчанию)
+    op.execute(text(f"""
+        CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('sync_change_seq');
+            NEW.change_xid := {CURRENT_XID};
+            NEW.updated_at := now();
+            RETURN NEW;
+        END $$
+    """))
+
+
+def downgrade():
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('sync_change_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END $$
+    """))
+
+    op.drop_index('ix_flashcards_category_id_change_xid', table_name='flashcards')
+    for table in SYNC_TABLES:
+        op.drop_index(f'ix_{table}_user_id_change_xid', table_name=table)
+        op.drop_column(table, 'change_xid')
@@ -0,0 +1,27 @@
+"""Add background_jobs.args for resuming jobs
+
+Revision ID: b5d9f3a7c164
+Revises: 9d4f6b8c0e35
+Create Date: 2026-10-19 03:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d9f3a7c164'
+down_revision = '9d4f6b8c0e35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('background_jobs', sa.Column('args', sa.JSON(), nullable=True))
+    # Задачи без пульса ищутся по статусу и времени обновления
+    op.create_index('ix_background_jobs_status_updated_at', 'background_jobs', ['status', 'updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_background_jobs_status_updated_at', table_name='background_jobs')
+    op.drop_column('background_jobs', 'args')
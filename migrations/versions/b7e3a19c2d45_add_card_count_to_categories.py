@@ -0,0 +1,38 @@
+"""Add denormalized card_count to categories
+
+Revision ID: b7e3a19c2d45
+Revises: 8c1d2f4a9b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3a19c2d45'
+down_revision = '8c1d2f4a9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('categories', sa.Column('card_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill: один проход по flashcards вместо COUNT на каждую категорию
+    op.execute(text("""
+        UPDATE categories AS c
+        SET card_count = counts.n
+        FROM (
+            SELECT category_id, COUNT(*) AS n
+            FROM flashcards
+            WHERE category_id IS NOT NULL
+            GROUP BY category_id
+        ) AS counts
+        WHERE counts.category_id = c.id
+    """))
+
+
+def downgrade():
+    op.drop_column('categories', 'card_count')
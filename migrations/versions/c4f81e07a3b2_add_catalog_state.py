@@ -0,0 +1,31 @@
+"""Add catalog_state for public catalog cache versioning
+
+Revision ID: c4f81e07a3b2
+Revises: b7e3a19c2d45
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f81e07a3b2'
+down_revision = 'b7e3a19c2d45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(text("INSERT INTO catalog_state (id, version, updated_at) VALUES (1, 1, now())"))
+
+
+def downgrade():
+    op.drop_table('catalog_state')
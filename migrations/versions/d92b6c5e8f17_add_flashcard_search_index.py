@@ -0,0 +1,42 @@
+"""Add trigram search index over flashcards front/back
+
+Revision ID: d92b6c5e8f17
+Revises: c4f81e07a3b2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92b6c5e8f17'
+down_revision = 'c4f81e07a3b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm — триграммный поиск, unaccent — свёртка ä/ö/ü → a/o/u, ß → ss, ё → е,
+    # btree_gin — позволяет положить user_id в тот же GIN-индекс
+    op.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    op.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    op.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+
+    # unaccent() помечена STABLE, для индекса по выражению нужна IMMUTABLE-обёртка
+    op.execute(text("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+        $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """))
+
+    # Выражение должно совпадать с routes/flashcards.py:SEARCH_TEXT
+    op.execute(text("""
+        CREATE INDEX ix_flashcards_search_trgm ON flashcards
+        USING gin (user_id, f_unaccent(lower(front || ' ' || back)) gin_trgm_ops)
+    """))
+
+
+def downgrade():
+    op.execute(text("DROP INDEX IF EXISTS ix_flashcards_search_trgm"))
+    op.execute(text("DROP FUNCTION IF EXISTS f_unaccent(text)"))
@@ -0,0 +1,113 @@
+"""Add change_seq/updated_at and tombstones for delta sync
+
+Revision ID: e5a7c3d1b248
+Revises: d92b6c5e8f17
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c3d1b248'
+down_revision = 'd92b6c5e8f17'
+branch_labels = None
+depends_on = None
+
+# Таблицы, изменения которых отдаёт GET /sync/changes, и имя сущности для tombstone
+SYNC_TABLES = {
+    'categories': 'category',
+    'flashcards': 'flashcard',
+    'repetition_schedule': 'schedule',
+    'category_subscriptions': None,  # отписка = удаление категории у подписчика
+}
+
+
+def upgrade():
+    # 1. Общая монотонная последовательность изменений
+    op.execute(text("CREATE SEQUENCE sync_change_seq"))
+
+    op.create_table('sync_tombstones',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('sync_change_seq')"), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_tombstones_user_id_change_seq', 'sync_tombstones', ['user_id', 'change_seq'])
+
+    # 2. change_seq/updated_at: существующие строки получают номера при добавлении колонки
+    for table in SYNC_TABLES:
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('sync_change_seq')"), nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+        op.create_index(f'ix_{table}_user_id_change_seq', table, ['user_id', 'change_seq'])
+    op.create_index('ix_flashcards_category_id_change_seq', 'flashcards', ['category_id', 'change_seq'])
+
+    # 3. Триггеры: номер изменения на каждую вставку/обновление, tombstone на удаление.
+    # Работают и для set-based UPDATE/DELETE, которые минуют ORM.
+    op.execute(text("""
+        CREATE FUNCTION sync_touch() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_seq := nextval('sync_change_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END $$
+    """))
+    op.execute(text("""
+        CREATE FUNCTION sync_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO sync_tombstones (user_id, entity, entity_id)
+            VALUES (OLD.user_id, TG_ARGV[0], OLD.id);
+            RETURN OLD;
+        END $$
+    """))
+    op.execute(text("""
+        CREATE FUNCTION sync_subscription_tombstone() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO sync_tombstones (user_id, entity, entity_id)
+            VALUES (OLD.user_id, 'category', OLD.category_id);
+            RETURN OLD;
+        END $$
+    """))
+
+    for table, entity in SYNC_TABLES.items():
+        # У подписки синхронизируется только факт её создания: служебный
+        # scheduled_through меняется при каждой выдаче карточек и не должен
+        # заставлять клиента заново скачивать весь набор.
+        events = 'INSERT OR UPDATE' if entity else 'INSERT'
+        op.execute(text(f"""
+            CREATE TRIGGER {table}_sync_touch BEFORE {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_touch()
+        """))
+        if entity:
+            op.execute(text(f"""
+                CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION sync_tombstone('{entity}')
+            """))
+        else:
+            op.execute(text(f"""
+                CREATE TRIGGER {table}_sync_tombstone AFTER DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION sync_subscription_tombstone()
+            """))
+
+
+def downgrade():
+    op.drop_index('ix_flashcards_category_id_change_seq', table_name='flashcards')
+    for table in SYNC_TABLES:
+        op.execute(text(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone ON {table}"))
+        op.execute(text(f"DROP TRIGGER IF EXISTS {table}_sync_touch ON {table}"))
+        op.drop_index(f'ix_{table}_user_id_change_seq', table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'change_seq')
+
+    op.execute(text("DROP FUNCTION IF EXISTS sync_subscription_tombstone()"))
+    op.execute(text("DROP FUNCTION IF EXISTS sync_tombstone()"))
+    op.execute(text("DROP FUNCTION IF EXISTS sync_touch()"))
+
+    op.drop_index('ix_sync_tombstones_user_id_change_seq', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.execute(text("DROP SEQUENCE IF EXISTS sync_change_seq"))
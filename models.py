@@ -10,6 +10,10 @@ class User(db.Model):
 
     studying_count = db.Column(db.Integer, default=0, nullable=False) 
     learned_count = db.Column(db.Integer, default=0, nullable=False)
+    # Алгоритм интервалов (utils.scheduler): "sm2" или "fsrs";
+    # fsrs_params — параметры FSRS, подобранные `flask scheduler fit` (NULL — по умолчанию)
+    scheduler = db.Column(db.String(16), default="sm2", server_default="sm2", nullable=False)
+    fsrs_params = db.Column(db.ARRAY(db.Float))
 
 class Category(db.Model):
     __tablename__ = "categories" # Добавлено для консистентности
@@ -18,24 +22,88 @@ class Category(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) 
     name = db.Column(db.String(100), nullable=False)
     level = db.Column(db.String(5), nullable=False, default='USER') 
+    # Денормализованное число карточек: обновляется в той же транзакции,
+    # что и создание/удаление карточек (utils.decks.adjust_card_counts).
+    # Сверка с реальными данными: flask seed counts
+    card_count = db.Column(db.Integer, default=0, nullable=False)
+    # Delta-синхронизация (routes/sync.py): поля выставляет триггер sync_touch
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    updated_at = db.Column(db.DateTime, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
     
     # 💥 Отношение определено ОДИН раз. Оно создаст Category.flashcards И Flashcard.category
     flashcards = db.relationship('Flashcard', backref='category', lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "name", name="uq_categories_user_name"),
+        db.Index("ix_categories_user_id_change_seq", "user_id", "change_seq"),
+        db.Index("ix_categories_user_id_change_xid", "user_id", "change_xid"),
+    )
 
-class Flashcard(db.Model):
-    __tablename__ = "flashcards"
+
+class CatalogState(db.Model):
+    """Версия публичного каталога (одна строка, id = 1).
+
+    Увеличивается командой `flask seed public`; по ней инвалидируется
+    кэш каталога в процессах (utils.catalog).
+    """
+    __tablename__ = "catalog_state"
     id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CardContent(db.Model):
+    """Текст карточки, общий для всех её копий (content-addressed).
+
+    content_hash = sha256(front + "\x1f" + back), см. utils.content.
+    Одинаковые фразы (в первую очередь из публичного каталога) хранятся
+    один раз, а flashcards ссылаются на них по content_id.
+    """
+    __tablename__ = "card_content"
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.LargeBinary(32), nullable=False, unique=True)
     front = db.Column(db.String(255), nullable=False)
     back = db.Column(db.String(255), nullable=False)
+
+
+class Flashcard(db.Model):
+    __tablename__ = "flashcards"
+    id = db.Column(db.Integer, primary_key=True)
+    # Текст карточки — в card_content; в SQL-запросах нужен явный join по content_id
+    content_id = db.Column(db.Integer, db.ForeignKey("card_content.id"), nullable=False)
+    content = db.relationship("CardContent", lazy="joined")
     # Ссылки на категории и пользователей
     category_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    # Delta-синхронизация (routes/sync.py): поля выставляет триггер sync_touch
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    updated_at = db.Column(db.DateTime, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
     
     # 💥 ИСПРАВЛЕНИЕ 2: Удалено конфликтное определение db.relationship
     # Свойство 'category' теперь создается автоматически через backref в Category.
     # Если бы вы хотели определить его здесь, вы бы использовали back_populates.
 
+    @property
+    def front(self):
+        return self.content.front
+
+    @property
+    def back(self):
+        return self.content.back
+
+    __table_args__ = (
+        db.Index("ix_flashcards_category_id_id", "category_id", "id"),
+        db.Index("ix_flashcards_content_id", "content_id"),
+        db.Index("ix_flashcards_user_id_change_seq", "user_id", "change_seq"),
+        db.Index("ix_flashcards_user_id_change_xid", "user_id", "change_xid"),
+        db.Index("ix_flashcards_category_id_change_seq", "category_id", "change_seq"),
+        db.Index("ix_flashcards_category_id_change_xid", "category_id", "change_xid"),
+        # Свои карточки пользователя по порядку id (колода, keyset-пагинация)
+        db.Index("ix_flashcards_user_id_id", "user_id", "id"),
+    )
+
 
 class QuizResult(db.Model):
     __tablename__ = "quiz_results"
@@ -43,15 +111,191 @@ class QuizResult(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     score = db.Column(db.Integer, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
+    # День активности: одна запись на (user_id, day), очки копятся в score
+    day = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "day", name="uq_quiz_results_user_day"),
+    )
+
+class CategorySubscription(db.Model):
+    """Подписка пользователя на публичный набор (user_id == 0).
+
+    Карточки набора не копируются: колода пользователя ссылается на общую
+    категорию, а личное состояние хранится только в RepetitionSchedule.
+    """
+    __tablename__ = "category_subscriptions"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    # Максимальный id карточки набора, для которой уже создано расписание
+    scheduled_through = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Delta-синхронизация (routes/sync.py): поля выставляет триггер sync_touch
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    updated_at = db.Column(db.DateTime, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "category_id", name="uq_category_subscriptions_user_category"),
+        db.Index("ix_category_subscriptions_user_id_change_seq", "user_id", "change_seq"),
+        db.Index("ix_category_subscriptions_user_id_change_xid", "user_id", "change_xid"),
+    )
 
 class RepetitionSchedule(db.Model):
     __tablename__ = "repetition_schedule"
     id = db.Column(db.Integer, primary_key=True)
-    flashcard_id = db.Column(db.Integer, db.ForeignKey("flashcards.id"), unique=True)
+    # Одна публичная карточка может иметь расписания у многих пользователей,
+    # поэтому уникальна пара (user_id, flashcard_id), а не flashcard_id.
+    flashcard_id = db.Column(db.Integer, db.ForeignKey("flashcards.id"))
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     next_review_date = db.Column(db.Date, nullable=False)
     repetitions = db.Column(db.Integer, default=0)
     efactor = db.Column(db.Float, default=2.5)
     interval = db.Column(db.Integer, default=1)
+    # Состояние FSRS (заполняется при ответах, если у пользователя scheduler = "fsrs")
+    stability = db.Column(db.Float)
+    difficulty = db.Column(db.Float)
+    last_review_date = db.Column(db.Date)
+    # Delta-синхронизация (routes/sync.py): поля выставляет триггер sync_touch
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
+    updated_at = db.Column(db.DateTime, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue())
     flashcard = db.relationship('Flashcard', backref='schedules', lazy=True)
-    flashcard = db.relationship("Flashcard", backref="schedule")
\ No newline at end of file
+    flashcard = db.relationship("Flashcard", backref="schedule")
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "flashcard_id", name="uq_repetition_schedule_user_flashcard"),
+        db.Index("ix_repetition_schedule_user_id_change_seq", "user_id", "change_seq"),
+        db.Index("ix_repetition_schedule_user_id_change_xid", "user_id", "change_xid"),
+        # Очередь на повторение (/repetition/today, /next): WHERE user_id = ? AND
+        # next_review_date <= ? ORDER BY next_review_date; flashcard_id — для join без чтения таблицы
+        db.Index(
+            "ix_repetition_schedule_user_id_next_review_date", "user_id", "next_review_date",
+            postgresql_include=["flashcard_id"]
+        ),
+        # Удаление карточек: расписания всех пользователей по flashcard_id
+        db.Index("ix_repetition_schedule_flashcard_id", "flashcard_id"),
+    )
+
+
+class SyncTombstone(db.Model):
+    """Запись об удалении для delta-синхронизации (пишет триггер sync_tombstone).
+
+    entity: 'flashcard' | 'category' | 'schedule'. Отписка от публичного
+    набора записывается как удаление категории у подписчика.
+    """
+    __tablename__ = "sync_tombstones"
+    id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue())
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=db.FetchedValue())
+    deleted_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index("ix_sync_tombstones_user_id_change_seq", "user_id", "change_seq"),
+        db.Index("ix_sync_tombstones_user_id_change_xid", "user_id", "change_xid"),
+    )
+
+
+class BackgroundJob(db.Model):
+    """Долгая операция, выполняемая вне запроса (utils.jobs).
+
+    Клиент получает id задачи и опрашивает GET /flashcards/jobs/<id>.
+    status: pending → running → done | failed. Задачи, оставшиеся в
+    pending/running после перезапуска воркера, возобновляет `flask jobs resume`.
+    """
+    __tablename__ = "background_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    # Итог задачи для клиента (например, сводка импорта)
+    result = db.Column(db.JSON)
+    # Аргументы функции задачи — для `flask jobs resume`
+    args = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Пульс задачи: обновляется при каждом сообщении о прогрессе
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_background_jobs_status_updated_at", "status", "updated_at"),
+    )
+
+
+class DailyQueueSnapshot(db.Model):
+    """Предрасчитанная очередь на день (`flask repetition precompute`).
+
+    card_ids — первая страница карточек к повторению в порядке выдачи,
+    due_count — сколько всего карточек пора повторить. Снимок годен, пока
+    совпадают day и version (отметка изменений строк пользователя и подписанных наборов, см. utils.daily_queue).
+    """
+    __tablename__ = "daily_queue"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    version = db.Column(db.BigInteger, nullable=False)
+    due_count = db.Column(db.Integer, nullable=False)
+    card_ids = db.Column(db.ARRAY(db.Integer), nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UserCounterDelta(db.Model):
+    """Изменение счётчиков users.studying_count / learned_count.
+
+    POST /repetition/result только дописывает сюда строку, не блокируя
+    строку users; `flask repetition fold-counters` периодически сворачивает
+    дельты в users. Текущее значение = users + несвёрнутые дельты
+    (utils.stats.user_counters).
+    """
+    __tablename__ = "user_counter_deltas"
+    id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    studying_delta = db.Column(db.Integer, nullable=False, default=0)
+    learned_delta = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ReviewLog(db.Model):
+    """Ответ пользователя на карточку — история для подбора параметров FSRS.
+
+    elapsed_days — дней с предыдущего ответа на эту карточку (NULL, если он
+    неизвестен). flashcard_id без внешнего ключа: история удалённых
+    карточек тоже годится для подбора.
+    """
+    __tablename__ = "review_logs"
+    id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    flashcard_id = db.Column(db.Integer, nullable=False)
+    quality = db.Column(db.SmallInteger, nullable=False)
+    elapsed_days = db.Column(db.Integer)
+    reviewed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # `flask scheduler fit`: история пользователей пачкой, по карточкам в порядке ответов
+        db.Index("ix_review_logs_user_id_flashcard_id_reviewed_at", "user_id", "flashcard_id", "reviewed_at"),
+    )
+
+
+class StudySession(db.Model):
+    """Сессия изучения (POST /repetition/sessions): постраничная выдача карточек.
+
+    Порядок — по flashcard_id, страница продолжается после cursor (keyset).
+    Снимок при создании: карточки с id больше max_flashcard_id (добавленные
+    позже) не выдаются, а "пора повторить" считается на день day.
+    """
+    __tablename__ = "study_sessions"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    category_id = db.Column(db.Integer)
+    # Только карточки, которые пора повторить (next_review_date <= day)
+    due_only = db.Column(db.Boolean, nullable=False, default=True)
+    day = db.Column(db.Date, nullable=False)
+    max_flashcard_id = db.Column(db.Integer, nullable=False)
+    cursor = db.Column(db.Integer, nullable=False, default=0)
+    page_size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
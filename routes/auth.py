@@ -5,6 +5,8 @@ from flask_jwt_extended import create_access_token
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import jsonify
 from models import User
+from utils.stats import user_counters
+from utils.scheduler import SCHEDULERS
 
 # 👇 это должно быть в самом верху!
 auth_bp = Blueprint("auth", __name__)
@@ -54,8 +56,32 @@ def profile():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
+    # Счётчики = users + несвёрнутые дельты (см. utils.stats)
+    studying_count, learned_count = user_counters(user_id)
+
     return jsonify({
         "id": user.id,
         "name": getattr(user, "name", None),
-        "email": user.email
-    }), 200
\ No newline at end of file
+        "email": user.email,
+        "studying_count": studying_count,
+        "learned_count": learned_count,
+        "scheduler": user.scheduler
+    }), 200
+
+
+# выбор алгоритма интервалов: {"scheduler": "sm2" | "fsrs"}
+@auth_bp.route("/scheduler", methods=["PUT"])
+@jwt_required()
+def set_scheduler():
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    scheduler = data.get("scheduler")
+    if scheduler not in SCHEDULERS:
+        return jsonify({"error": f"scheduler должен быть одним из: {', '.join(SCHEDULERS)}"}), 400
+
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    user.scheduler = scheduler
+    db.session.commit()
+    return jsonify({"scheduler": user.scheduler}), 200
\ No newline at end of file
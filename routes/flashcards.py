@@ -1,8 +1,26 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import tempfile
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import date
 from extensions import db
-from models import Flashcard, Category, RepetitionSchedule
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from models import Flashcard, Category, RepetitionSchedule, CategorySubscription, BackgroundJob, CardContent
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from utils.decks import (
+    ADMIN_USER_ID, accessible_cards_filter, in_subscribed_categories, adjust_card_counts, clear_category,
+    resolve_category_id, resolve_category_ids, forget_category,
+)
+from utils.jobs import job_target, start_job, report_progress, stage_progress, job_json
+from utils.catalog import get_public_catalog
+from utils.daily_queue import invalidate_queue
+from utils.anki import iter_apkg_rows
+from utils.export import iter_csv, iter_ndjson, gzip_stream, zip_stream
+from utils.bulk import (
+    BulkParseError, iter_json_array, iter_csv_rows, iter_batches,
+    validate_card_row, insert_cards,
+)
 
 flashcards_bp = Blueprint("flashcards", __name__)
 
@@ -10,33 +28,282 @@ flashcards_bp = Blueprint("flashcards", __name__)
 # 📌 МАРШРУТЫ КАРТОЧЕК
 # ===================================================
 
-# 1. Получить все карточки (ИСПРАВЛЕННЫЙ КОД)
+# Категории крупнее этого удаляются фоновой задачей пачками по CATEGORY_DELETE_CHUNK
+CATEGORY_DELETE_SYNC_LIMIT = 1000
+CATEGORY_DELETE_CHUNK = 500
+# Максимальный размер страницы для keyset-пагинации GET /flashcards
+FLASHCARDS_PAGE_MAX = 1000
+# Сколько строк за раз читается из серверного курсора в потоковом режиме
+FLASHCARDS_STREAM_CHUNK = 1000
+# Сколько карточек можно запросить по id за один раз (?ids= и POST /lookup)
+FLASHCARDS_LOOKUP_MAX = 200
+
+
+def _deck_query(user_id):
+    """Колонки карточек колоды + имя категории, упорядоченные по id.
+
+    Выбираются только нужные колонки (без ORM-объектов), чтобы строки
+    можно было отдавать по мере чтения из курсора.
+    """
+    return db.session.query(
+        Flashcard.id, CardContent.front, CardContent.back, Flashcard.category_id, Category.name
+    ).join(
+        CardContent, Flashcard.content_id == CardContent.id
+    ).outerjoin(
+        Category, Flashcard.category_id == Category.id
+    ).filter(
+        accessible_cards_filter(user_id)
+    ).order_by(Flashcard.id)
+
+
+def _lookup_cards(user_id, card_ids):
+    """Карточки колоды по списку id вместе с расписанием пользователя.
+
+    Один запрос: flashcards JOIN card_content LEFT JOIN repetition_schedule
+    (по уникальному (user_id, flashcard_id)). Возвращает строки в порядке
+    `card_ids`; недоступные и несуществующие id пропускаются.
+    """
+    rows = db.session.query(
+        Flashcard.id, CardContent.front, CardContent.back, Flashcard.category_id,
+        RepetitionSchedule.id.label("schedule_id"), RepetitionSchedule.next_review_date,
+        RepetitionSchedule.repetitions, RepetitionSchedule.efactor, RepetitionSchedule.interval
+    ).join(
+        CardContent, Flashcard.content_id == CardContent.id
+    ).outerjoin(
+        RepetitionSchedule,
+        (RepetitionSchedule.flashcard_id == Flashcard.id) & (RepetitionSchedule.user_id == user_id)
+    ).filter(
+        Flashcard.id.in_(card_ids), accessible_cards_filter(user_id)
+    ).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[card_id] for card_id in dict.fromkeys(card_ids) if card_id in by_id]
+
+
+def _card_json(row):
+    return {
+        "id": row.id,
+        "front": row.front,
+        "back": row.back,
+        "category_id": row.category_id,
+        "schedule_id": row.schedule_id,
+        "schedule": {
+            "next_review_date": str(row.next_review_date),
+            "repetitions": row.repetitions,
+            "efactor": row.efactor,
+            "interval": row.interval
+        } if row.schedule_id else None
+    }
+
+
+def _parse_card_ids(values):
+    """Список id из ?ids=1,2,3 или JSON-массива; None, если он некорректен."""
+    if isinstance(values, str):
+        values = [value for value in values.split(",") if value.strip()]
+    if not isinstance(values, list):
+        return None
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def _lookup_response(user_id, values):
+    card_ids = _parse_card_ids(values)
+    if not card_ids:
+        return jsonify({"error": "Передайте список id карточек"}), 400
+    if len(card_ids) > FLASHCARDS_LOOKUP_MAX:
+        return jsonify({"error": f"Не больше {FLASHCARDS_LOOKUP_MAX} карточек за запрос"}), 400
+    return jsonify([_card_json(row) for row in _lookup_cards(user_id, card_ids)]), 200
+
+
+def _deck_row_json(row):
+    return {
+        "id": row.id,
+        "front": row.front,
+        "back": row.back,
+        # имя категории, если она есть, иначе "Без категории"
+        "category_name": row.name if row.name is not None else "Без категории",
+        "category_id": row.category_id
+    }
+
+
+# 1. Получить все карточки
+#    ?ids=1,2,3      — только указанные карточки с расписанием (один запрос)
+#    ?limit=&after=  — keyset-пагинация по Flashcard.id
+#    ?stream=1       — весь список потоковым JSON-массивом (серверный курсор)
 @flashcards_bp.route("", methods=["GET"])
 @jwt_required()
 def get_flashcards():
     user_id = int(get_jwt_identity())
-    
-    # Запрашиваем все карточки пользователя, объединяя их с Category
-    # Используем db.session.query и outerjoin, чтобы получить название категории 
-    # в один запрос и избежать ошибки N+1.
-    flashcards_with_categories = db.session.query(Flashcard, Category).outerjoin(
-        Category, Flashcard.category_id == Category.id
+    if "ids" in request.args:
+        return _lookup_response(user_id, request.args["ids"])
+
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after", type=int)
+
+    # Карточки подписанных публичных наборов тоже входят в колоду.
+    query = _deck_query(user_id)
+
+    # 1.1. Страница: WHERE id > :after ORDER BY id LIMIT :limit (по индексу, без OFFSET)
+    if limit is not None or after is not None:
+        limit = max(1, min(limit or FLASHCARDS_PAGE_MAX, FLASHCARDS_PAGE_MAX))
+        if after is not None:
+            query = query.filter(Flashcard.id > after)
+        rows = query.limit(limit).all()
+        return jsonify({
+            "items": [_deck_row_json(row) for row in rows],
+            "next_after": rows[-1].id if len(rows) == limit else None
+        }), 200
+
+    # 1.2. Потоковый режим: память на запрос не зависит от размера колоды
+    if request.args.get("stream") in ("1", "true"):
+        rows = query.execution_options(yield_per=FLASHCARDS_STREAM_CHUNK)
+
+        def generate():
+            yield "["
+            first = True
+            for row in rows:
+                yield ("" if first else ",") + json.dumps(_deck_row_json(row), ensure_ascii=False)
+                first = False
+            yield "]"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
+
+    # 1.3. Прежнее поведение: весь список одним ответом
+    return jsonify([_deck_row_json(row) for row in query.all()]), 200
+
+# Текст для поиска: обе стороны в нижнем регистре, без умлаутов/ß.
+# Выражение совпадает с индексом ix_card_content_search_trgm (GIN, pg_trgm):
+# индексируется каждый уникальный текст один раз, а не каждая копия карточки.
+SEARCH_TEXT = db.func.f_unaccent(
+    db.func.lower(CardContent.front + db.literal_column("' '") + CardContent.back)
+)
+# Из запроса короче трёх символов pg_trgm не извлекает полных триграмм,
+# и индекс не может отобрать строки — такой поиск читал бы всю таблицу
+SEARCH_MIN_QUERY_LEN = 3
+SEARCH_MAX_RESULTS = 50
+
+
+# 1.0. Карточки по списку id в теле запроса (для длинных списков): {"ids": [...]}
+@flashcards_bp.route("/lookup", methods=["POST"])
+@jwt_required()
+def lookup_flashcards():
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    return _lookup_response(user_id, data.get("ids"))
+
+
+# 1.1. Поиск по карточкам: ?q=&scope=all|mine|public&limit=
+@flashcards_bp.route("/search", methods=["GET"])
+@jwt_required()
+def search_flashcards():
+    user_id = int(get_jwt_identity())
+    q = (request.args.get("q") or "").strip()
+    scope = request.args.get("scope", "all")
+    limit = max(1, min(request.args.get("limit", SEARCH_MAX_RESULTS, type=int), SEARCH_MAX_RESULTS))
+
+    if len(q) < SEARCH_MIN_QUERY_LEN:
+        return jsonify({"error": f"Запрос должен быть не короче {SEARCH_MIN_QUERY_LEN} символов"}), 400
+
+    if scope == "mine":
+        scope_filter = accessible_cards_filter(user_id)
+    elif scope == "public":
+        scope_filter = Flashcard.user_id == ADMIN_USER_ID
+    elif scope == "all":
+        scope_filter = Flashcard.user_id.in_([user_id, ADMIN_USER_ID])
+    else:
+        return jsonify({"error": "scope: all, mine или public"}), 400
+
+    # Запрос сворачивается так же, как индексируемый текст.
+    # Оба условия (<% — похожесть по словам, ILIKE — подстрока) обслуживаются
+    # GIN-индексом по уникальным текстам; совпавшие тексты отсеиваются
+    # полусоединением (EXISTS) с карточками области по ix_flashcards_content_id,
+    # и только лучшие `limit` текстов разворачиваются в карточки.
+    folded = db.func.f_unaccent(db.func.lower(q))
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    score = db.func.word_similarity(folded, SEARCH_TEXT).label("score")
+    in_scope = db.session.query(Flashcard.id).filter(
+        Flashcard.content_id == CardContent.id, scope_filter
+    ).exists()
+
+    matched = db.session.query(
+        CardContent.id, CardContent.front, CardContent.back, score
     ).filter(
-        Flashcard.user_id == user_id
-    ).all()
+        or_(
+            folded.op("<%")(SEARCH_TEXT),
+            SEARCH_TEXT.ilike(db.func.f_unaccent(db.func.lower(pattern)))
+        ),
+        in_scope
+    ).order_by(score.desc(), CardContent.id).limit(limit).subquery()
+
+    rows = db.session.query(
+        Flashcard.id, matched.c.front, matched.c.back, Flashcard.category_id, Flashcard.user_id, matched.c.score
+    ).join(
+        matched, Flashcard.content_id == matched.c.id
+    ).filter(
+        scope_filter
+    ).order_by(matched.c.score.desc(), Flashcard.id).limit(limit).all()
+
+    return jsonify([
+        {
+            "id": row.id,
+            "front": row.front,
+            "back": row.back,
+            "category_id": row.category_id,
+            "is_public": row.user_id == ADMIN_USER_ID,
+            "score": round(row.score, 3)
+        }
+        for row in rows
+    ]), 200
 
-    result = []
-    for card, category in flashcards_with_categories:
-        result.append({
-            "id": card.id,
-            "front": card.front,
-            "back": card.back,
-            # category.name будет именем, если категория есть, иначе "Без категории"
-            "category_name": category.name if category else "Без категории", 
-            "category_id": card.category_id
-        })
 
-    return jsonify(result), 200
+EXPORT_FORMATS = {
+    # format -> (кодировщик, расширение, mimetype)
+    "csv": (iter_csv, "csv", "text/csv"),
+    "ndjson": (iter_ndjson, "ndjson", "application/x-ndjson"),
+}
+
+
+# 1.2. Экспорт колоды: ?format=csv|ndjson|zip&category_id=&gzip=1
+#      Строки идут из серверного курсора через потоковый кодировщик,
+#      память не зависит от размера колоды.
+@flashcards_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_flashcards():
+    user_id = int(get_jwt_identity())
+    fmt = request.args.get("format", "csv")
+    category_id = request.args.get("category_id", type=int)
+    use_gzip = request.args.get("gzip") in ("1", "true")
+
+    if fmt not in EXPORT_FORMATS and fmt != "zip":
+        return jsonify({"error": "format: csv, ndjson или zip"}), 400
+
+    query = _deck_query(user_id).add_columns(
+        RepetitionSchedule.next_review_date, RepetitionSchedule.repetitions,
+        RepetitionSchedule.efactor, RepetitionSchedule.interval
+    ).outerjoin(
+        RepetitionSchedule,
+        (RepetitionSchedule.flashcard_id == Flashcard.id) & (RepetitionSchedule.user_id == user_id)
+    )
+    if category_id is not None:
+        query = query.filter(Flashcard.category_id == category_id)
+    rows = query.execution_options(yield_per=FLASHCARDS_STREAM_CHUNK)
+
+    encoder, extension, mimetype = EXPORT_FORMATS["csv" if fmt == "zip" else fmt]
+    filename = f"flashcards.{extension}"
+    chunks = encoder(rows)
+    if fmt == "zip":
+        chunks = zip_stream(chunks, filename)
+        filename, mimetype = "flashcards.zip", "application/zip"
+    elif use_gzip:
+        chunks = gzip_stream(chunks)
+        filename, mimetype = filename + ".gz", "application/gzip"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # routes/flashcards.py
 
@@ -57,50 +324,243 @@ def create_flashcard():
     if not front or not back:
         return jsonify({"error": "Заполните обе стороны"}), 400
 
-    final_category_id = None
-
-    if category_name:
-        category = Category.query.filter_by(user_id=user_id, name=category_name).first()
-
-        if not category:
-            category = Category(
-                user_id=user_id,
-                name=category_name,
-                level='USER' 
-            )
-            db.session.add(category)
-            db.session.flush() # Получаем ID новой категории
-        final_category_id = category.id
-    
-    # 1. Создание карточки
-    new_card = Flashcard(
-        front=front,
-        back=back,
-        category_id=final_category_id,
-        user_id=user_id
-    )
-    db.session.add(new_card)
-    
-    # 💥 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: db.session.flush()
-    # Получает new_card.id для RepetitionSchedule.
-    db.session.flush() 
-    print(f"--- DEBUG: ID созданной карточки: {new_card.id} ---")
-    print(f"--- DEBUG: Next review date: {date.today()} ---")
-    # 2. Создание расписания (с ID только что созданной карточки)
-    initial_schedule = RepetitionSchedule(
-        flashcard_id=new_card.id,
-        user_id=user_id,
-        next_review_date=date.today(), 
-        repetitions=0,
-        efactor=2.5,
-        interval=1
-    )
-    db.session.add(initial_schedule)
-    
-    # 3. Единый commit() для сохранения карточки и расписания
-    db.session.commit()
+    # Вторая попытка нужна, если id категории в кэше воркера устарел
+    # (категорию удалили через другой воркер) — это ловится как нарушение FK.
+    for attempt in range(2):
+        try:
+            # 1. Категория: из кэша (0 запросов) или INSERT ... ON CONFLICT DO NOTHING
+            final_category_id = resolve_category_id(user_id, category_name) if category_name else None
+
+            # 2. Карточка (INSERT ... RETURNING id) и её расписание
+            new_card_id, = insert_cards(user_id, [
+                {"front": front, "back": back, "category_id": final_category_id}
+            ])
+            adjust_card_counts({final_category_id: 1})
+
+            # 3. Единый commit() для сохранения карточки и расписания
+            db.session.commit()
+            invalidate_queue(user_id)
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt or not category_name:
+                raise
+            forget_category(user_id, category_name)
+
+    return jsonify({"message": "Карточка создана", "id": new_card_id}), 201
+
+# 2.1. Массовое создание карточек (JSON-массив или CSV в теле запроса)
+@flashcards_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create_flashcards():
+    user_id = int(get_jwt_identity())
 
-    return jsonify({"message": "Карточка создана", "id": new_card.id}), 201
+    # Тело читается потоково, а не через request.get_json()
+    if request.mimetype in ("text/csv", "text/plain"):
+        items = iter_csv_rows(request.stream)
+    else:
+        items = iter_json_array(request.stream)
+
+    created = 0
+    errors = []
+    row_number = 0
+
+    try:
+        for batch in iter_batches(items):
+            # 1. Валидация пачки: ошибки копятся по строкам и не валят весь импорт
+            valid = []
+            for item in batch:
+                row_number += 1
+                parsed = validate_card_row(item)
+                if isinstance(parsed, str):
+                    errors.append({"row": row_number, "error": parsed})
+                else:
+                    valid.append((row_number, parsed))
+            if not valid:
+                continue
+
+            # 2. Пачка сохраняется своей транзакцией
+            created += _save_batch(user_id, valid, errors)
+    except BulkParseError as e:
+        errors.append({"row": row_number + 1, "error": str(e)})
+
+    return jsonify({"created": created, "errors": errors}), 201 if created else 400
+
+
+def _insert_rows(user_id, valid, with_schedule):
+    """Категории, карточки с расписаниями и card_count для строк `valid`."""
+    # Категории разрешаются один раз на пачку, затем многострочные INSERT
+    category_ids = resolve_category_ids(user_id, {name for _, (_, _, name, _) in valid})
+    rows = [
+        {
+            "front": front, "back": back, "category_id": category_ids.get(name),
+            "schedule": schedule if with_schedule else None
+        }
+        for _, (front, back, name, schedule) in valid
+    ]
+    insert_cards(user_id, rows)
+
+    deltas = {}
+    for row in rows:
+        deltas[row["category_id"]] = deltas.get(row["category_id"], 0) + 1
+    adjust_card_counts(deltas)
+
+
+def _save_batch(user_id, valid, errors, with_schedule=False, before_commit=None):
+    """Сохраняет пачку провалидированных строк одной транзакцией.
+
+    valid: список (номер строки, результат validate_card_row).
+    Ошибки дописываются в `errors`; возвращает число созданных карточек.
+    before_commit(saved) вызывается в той же транзакции перед коммитом
+    (фоновый импорт фиксирует так прогресс вместе с пачкой).
+    Если пачка целиком не вставляется, строки сохраняются по одной, каждая
+    в своей точке сохранения: ошибку получают только отвергнутые строки.
+    """
+    names = {name for _, (_, _, name, _) in valid}
+    for attempt in range(2):
+        try:
+            _insert_rows(user_id, valid, with_schedule)
+            if before_commit:
+                before_commit(len(valid))
+            db.session.commit()
+            invalidate_queue(user_id)
+            return len(valid)
+        except SQLAlchemyError as e:
+            # Откатывается только текущая пачка, уже сохранённые остаются
+            db.session.rollback()
+            for name in names:
+                forget_category(user_id, name)
+            # Возможно, устарел кэш категорий — повторяем пачку один раз
+            if not isinstance(e, IntegrityError):
+                break
+
+    saved = []
+    for number, parsed in valid:
+        try:
+            with db.session.begin_nested():
+                _insert_rows(user_id, [(number, parsed)], with_schedule)
+            saved.append(number)
+        except SQLAlchemyError as e:
+            # id категории, созданной в откатанной точке сохранения, недействителен
+            forget_category(user_id, parsed[2])
+            errors.append({"row": number, "error": str(getattr(e, "orig", e))})
+    try:
+        if before_commit:
+            before_commit(len(saved))
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        for name in names:
+            forget_category(user_id, name)
+        errors.extend({"row": number, "error": str(getattr(e, "orig", e))} for number in saved)
+        return 0
+    if saved:
+        invalidate_queue(user_id)
+    return len(saved)
+
+
+# Формат файла импорта (по расширению) -> разделитель CSV; None — колода Anki
+IMPORT_FORMATS = {
+    "csv": ",",
+    "tsv": "\t",
+    "txt": "\t",
+    "apkg": None,
+}
+# Сколько ошибок по строкам сохраняется в итоге задачи импорта
+IMPORT_MAX_ERRORS = 100
+
+
+# 2.2. Импорт колоды из файла (CSV, TSV или Anki .apkg) — фоновой задачей
+#      multipart/form-data: file, category (для строк без категории),
+#      schedule=1 — перенести состояние повторения
+@flashcards_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_flashcards():
+    user_id = int(get_jwt_identity())
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"error": "Файл не передан"}), 400
+
+    fmt = (request.form.get("format") or os.path.splitext(upload.filename)[1].lstrip(".")).lower()
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"error": "Поддерживаются файлы .csv, .tsv и .apkg"}), 400
+
+    default_category = (request.form.get("category") or "").strip()
+    with_schedule = request.form.get("schedule") in ("1", "true")
+
+    # Файл сохраняется на диск по частям; задача читает его потоково и удаляет
+    fd, path = tempfile.mkstemp(suffix="." + fmt)
+    os.close(fd)
+    upload.save(path)
+
+    job = start_job("import", user_id, user_id, path, fmt, default_category, with_schedule)
+    return jsonify({"message": "Импорт запущен", "job_id": job.id}), 202
+
+
+def _capped_errors(errors, new_errors):
+    """Часть new_errors, которая помещается в итог рядом с errors (не больше IMPORT_MAX_ERRORS)."""
+    return list(new_errors[:max(0, IMPORT_MAX_ERRORS - len(errors))])
+
+
+@job_target("import")
+def _import_job(job_id, user_id, path, fmt, default_category, with_schedule):
+    # При возобновлении (`flask jobs resume`) строки до сохранённого
+    # прогресса уже обработаны: их пачки закоммичены вместе с прогрессом
+    job = db.session.get(BackgroundJob, job_id)
+    done_rows = job.progress
+    previous = job.result or {}
+    created = previous.get("created", 0)
+    skipped = previous.get("skipped", 0)
+    errors = previous.get("errors", [])
+    row_number = 0
+
+    def summary(saved=0, batch_errors=()):
+        """Итог для клиента; saved и batch_errors — ещё не учтённая пачка."""
+        return {
+            "created": created + saved,
+            "skipped": skipped + len(batch_errors),
+            "errors": errors + _capped_errors(errors, batch_errors)
+        }
+
+    try:
+        with open(path, "rb") as stream:
+            if fmt == "apkg":
+                items = iter_apkg_rows(path)
+            else:
+                items = iter_csv_rows(stream, delimiter=IMPORT_FORMATS[fmt])
+
+            try:
+                for batch in iter_batches(items):
+                    if row_number + len(batch) <= done_rows:
+                        row_number += len(batch)
+                        continue
+                    batch_errors = []
+                    valid = []
+                    for item in batch:
+                        row_number += 1
+                        if row_number <= done_rows:
+                            continue
+                        if default_category and isinstance(item, dict) and not item.get("category"):
+                            item["category"] = default_category
+                        parsed = validate_card_row(item)
+                        if isinstance(parsed, str):
+                            batch_errors.append({"row": row_number, "error": parsed})
+                        else:
+                            valid.append((row_number, parsed))
+                    if valid:
+                        def before_commit(saved):
+                            stage_progress(job_id, row_number, result=summary(saved, batch_errors))
+                        created += _save_batch(user_id, valid, batch_errors, with_schedule, before_commit)
+
+                    skipped += len(batch_errors)
+                    errors.extend(_capped_errors(errors, batch_errors))
+                    report_progress(job_id, row_number, result=summary())
+            except BulkParseError as e:
+                skipped += 1
+                errors.extend(_capped_errors(errors, [{"row": row_number + 1, "error": str(e)}]))
+                report_progress(job_id, row_number, result=summary())
+    finally:
+        os.unlink(path)
 
 # 3. Удалить карточку
 @flashcards_bp.route("/<int:card_id>", methods=["DELETE"])
@@ -113,8 +573,10 @@ def delete_flashcard(card_id):
     schedule = RepetitionSchedule.query.filter_by(flashcard_id=card_id).first()
     if schedule: db.session.delete(schedule)
 
+    adjust_card_counts({card.category_id: -1})
     db.session.delete(card)
     db.session.commit()
+    invalidate_queue(user_id)
     return jsonify({"message": "Удалено"}), 200
 
 
@@ -133,11 +595,16 @@ def add_category():
     
     if not name: return jsonify({"error": "Имя обязательно"}), 400
 
-    if Category.query.filter_by(user_id=user_id, name=name).first():
+    # Уникальность (user_id, name) гарантирует БД, без предварительного SELECT
+    new_category_id = db.session.execute(
+        insert(Category).values(user_id=user_id, name=name, level=level, card_count=0).on_conflict_do_nothing(
+            constraint="uq_categories_user_name"
+        ).returning(Category.id)
+    ).scalar()
+    if new_category_id is None:
+        db.session.rollback()
         return jsonify({"error": "Уже существует"}), 400
 
-    new_category = Category(user_id=user_id, name=name, level=level) 
-    db.session.add(new_category)
     db.session.commit()
     return jsonify({"message": "Создано"}), 201
 
@@ -147,15 +614,22 @@ def add_category():
 @jwt_required()
 def get_categories():
     user_id = int(get_jwt_identity())
-    categories = Category.query.filter_by(user_id=user_id).order_by(Category.name).all()
+    # Собственные категории + подписанные публичные наборы
+    categories = Category.query.filter(
+        or_(
+            Category.user_id == user_id,
+            in_subscribed_categories(Category.id, user_id)
+        )
+    ).order_by(Category.name).all()
 
     return jsonify([
         {
             "id": c.id, 
             "name": c.name,
             "level": c.level,
-            # 👇 ВОТ ЭТОЙ СТРОКИ НЕ ХВАТАЛО 👇
-            "card_count": Flashcard.query.filter_by(category_id=c.id).count()
+            "is_public": c.user_id == ADMIN_USER_ID,
+            # Денормализованный счётчик вместо COUNT на каждую категорию
+            "card_count": c.card_count
         } 
         for c in categories
     ]), 200
@@ -165,18 +639,16 @@ def get_categories():
 @flashcards_bp.route("/public_categories", methods=["GET"])
 @jwt_required()
 def get_public_categories():
-    ADMIN_USER_ID = 0 
-    categories = Category.query.filter_by(user_id=ADMIN_USER_ID).order_by(Category.level, Category.name).all()
-    
-    result = []
-    for c in categories:
-        result.append({
-            "id": c.id, 
-            "name": c.name,
-            "level": c.level,
-            "card_count": Flashcard.query.filter_by(category_id=c.id).count() 
-        })
-    return jsonify(result), 200
+    # Каталог одинаков для всех пользователей и меняется только через
+    # `flask seed public`: отдаём закэшированный JSON с версионным ETag,
+    # на If-None-Match отвечаем 304 без тела.
+    body, etag = get_public_catalog()
+
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get("CATALOG_MAX_AGE", 60)
+    return response.make_conditional(request)
 
 # 7. Добавить публичный набор
 @flashcards_bp.route("/add_public_set", methods=["POST"])
@@ -187,34 +659,29 @@ def add_public_set_to_user():
     category_id = data.get("category_id")
     
     public_category = Category.query.get(category_id)
-    if not public_category or public_category.user_id != 0: 
+    if not public_category or public_category.user_id != ADMIN_USER_ID: 
         return jsonify({"error": "Набор не найден"}), 404
-    
-    existing_category=Category.query.filter_by(user_id=user_id, name=public_category.name).first()
-    if existing_category:
+
+    # Карточки не копируются: пользователь подписывается на общий набор,
+    # расписания создаются лениво при первой выдаче (utils.decks.ensure_schedules).
+    # Одна INSERT-операция вне зависимости от размера набора.
+    subscription_id = db.session.execute(
+        insert(CategorySubscription).values(
+            user_id=user_id, category_id=public_category.id, scheduled_through=0
+        ).on_conflict_do_nothing(
+            constraint="uq_category_subscriptions_user_category"
+        ).returning(CategorySubscription.id)
+    ).scalar()
+    db.session.commit()
+    invalidate_queue(user_id)
+
+    if subscription_id is None:
         return jsonify({
             "message": "Уже добавлено, переходим к изучению", 
-            "category_id": existing_category.id 
+            "category_id": public_category.id 
         }), 200
 
-    new_category = Category(user_id=user_id, name=public_category.name, level=public_category.level)
-    db.session.add(new_category)
-    db.session.flush()
-
-    public_flashcards = Flashcard.query.filter_by(category_id=public_category.id).all()
-    for public_card in public_flashcards:
-        new_flashcard = Flashcard(
-            category_id=new_category.id, front=public_card.front, back=public_card.back, user_id=user_id 
-        )
-        db.session.add(new_flashcard)
-        db.session.flush()
-        initial_schedule = RepetitionSchedule(
-            flashcard_id=new_flashcard.id, user_id=user_id, next_review_date=date.today()
-        )
-        db.session.add(initial_schedule)
-        
-    db.session.commit()
-    return jsonify({"message": "Добавлено"}), 201
+    return jsonify({"message": "Добавлено", "category_id": public_category.id}), 201
 
 # 8. Удалить категорию
 @flashcards_bp.route("/category/<int:category_id>", methods=["DELETE"])
@@ -223,38 +690,79 @@ def delete_category(category_id):
     user_id = int(get_jwt_identity())
     category = Category.query.filter_by(id=category_id, user_id=user_id).first()
     
-    if not category: return jsonify({"error": "Не найдено"}), 404
+    if not category:
+        # Публичный набор: удаляем подписку и личные расписания по его карточкам
+        subscription = CategorySubscription.query.filter_by(
+            user_id=user_id, category_id=category_id
+        ).first()
+        if not subscription: return jsonify({"error": "Не найдено"}), 404
+
+        RepetitionSchedule.query.filter(
+            RepetitionSchedule.user_id == user_id,
+            RepetitionSchedule.flashcard_id.in_(
+                db.session.query(Flashcard.id).filter(Flashcard.category_id == category_id)
+            )
+        ).delete(synchronize_session=False)
+        db.session.delete(subscription)
+        db.session.commit()
+        invalidate_queue(user_id)
+        return jsonify({"message": "Удалено"}), 200
+
+    forget_category(user_id, category.name)
+
+    # ?delete_cards=1 — удалить карточки и их расписания, иначе карточки
+    # остаются "Без категории"
+    delete_cards = request.args.get("delete_cards") in ("1", "true")
+
+    # Большие категории обрабатываются фоновой задачей пачками
+    if category.card_count > CATEGORY_DELETE_SYNC_LIMIT:
+        job = start_job(
+            "delete_category", user_id, user_id, category_id, delete_cards, total=category.card_count
+        )
+        return jsonify({"message": "Удаление запущено", "job_id": job.id}), 202
 
-    # Отвязываем карточки (делаем их без категории)
-    cards = Flashcard.query.filter_by(category_id=category_id).all()
-    for card in cards:
-        card.category_id = None
-    
-    db.session.delete(category)
+    # Один UPDATE/DELETE ... WHERE category_id = :id вместо цикла по объектам
+    clear_category(category_id, delete_cards)
+    Category.query.filter_by(id=category_id).delete(synchronize_session=False)
     db.session.commit()
+    invalidate_queue(user_id)
     return jsonify({"message": "Удалено"}), 200
 
+
+# Повторяемая: при возобновлении продолжает с оставшихся в категории карточек
+@job_target("delete_category")
+def _delete_category_job(job_id, user_id, category_id, delete_cards):
+    clear_category(
+        category_id, delete_cards, chunk_size=CATEGORY_DELETE_CHUNK,
+        on_progress=lambda done: report_progress(job_id, done)
+    )
+    # Добиваем карточки, созданные во время работы, и удаляем саму категорию
+    # в одной транзакции
+    clear_category(category_id, delete_cards)
+    Category.query.filter_by(id=category_id).delete(synchronize_session=False)
+    db.session.commit()
+    invalidate_queue(user_id)
+
+
+# 8.1. Статус фоновой задачи
+@flashcards_bp.route("/jobs/<int:job_id>", methods=["GET"])
+@jwt_required()
+def get_job(job_id):
+    user_id = int(get_jwt_identity())
+    job = BackgroundJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job: return jsonify({"error": "Не найдено"}), 404
+    return jsonify(job_json(job)), 200
+
 # 9. Получить одну карточку по ID (НОВЫЙ МАРШРУТ)
 @flashcards_bp.route("/<int:card_id>", methods=["GET"])
 @jwt_required()
 def get_flashcard(card_id):
-    from models import RepetitionSchedule, Flashcard # Импорты должны быть доступны
-    
     user_id = int(get_jwt_identity())
-    
-    # Ищем карточку, принадлежащую пользователю
-    card = Flashcard.query.filter_by(id=card_id, user_id=user_id).first()
 
-    if not card:
+    # Карточка колоды (своя или из подписанного набора) вместе с расписанием
+    # пользователя (нужно для оценки, чтобы сохранить прогресс) — одним запросом
+    rows = _lookup_cards(user_id, [card_id])
+    if not rows:
         return jsonify({"error": "Карточка не найдена"}), 404
 
-    # Находим расписание повторения (нужно для оценки, чтобы сохранить прогресс)
-    schedule = RepetitionSchedule.query.filter_by(flashcard_id=card_id, user_id=user_id).first()
-
-    return jsonify({
-        "id": card.id,
-        "front": card.front,
-        "back": card.back,
-        "category_id": card.category_id,
-        "schedule_id": schedule.id if schedule else None 
-    }), 200
\ No newline at end of file
+    return jsonify(_card_json(rows[0])), 200
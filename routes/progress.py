@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import date, timedelta
+from datetime import timedelta
 from extensions import db
 # ❗ ФИНАЛЬНОЕ ИСПРАВЛЕНИЕ: Импортируем QuizResult для статистики и стрейков
 from models import Flashcard, RepetitionSchedule, QuizResult 
 from sqlalchemy import func
+from utils.decks import accessible_cards_filter
+from utils import clock
 
 # создаём blueprint
 progress_bp = Blueprint("progress", __name__)
@@ -14,10 +16,10 @@ progress_bp = Blueprint("progress", __name__)
 @jwt_required()
 def get_progress_stats():
     user_id = int(get_jwt_identity())
-    today = date.today()
+    today = clock.today()
 
-    # общее количество карточек пользователя
-    total_cards = Flashcard.query.filter_by(user_id=user_id).count()
+    # общее количество карточек пользователя (включая подписанные наборы)
+    total_cards = Flashcard.query.filter(accessible_cards_filter(user_id)).count()
 
     # 2. Количество "Изучено" (Mastered): efactor > 2.6 и >= 1 повторение
     mastered_cards = RepetitionSchedule.query.filter(
@@ -44,7 +46,7 @@ def get_progress_stats():
         # Проверяем, была ли хоть одна запись в QuizResult за этот день
         review_exists = QuizResult.query.filter(
             QuizResult.user_id == user_id,
-            db.func.date(QuizResult.date) == check_day
+            QuizResult.day == check_day
         ).first()
 
         if review_exists:
@@ -56,7 +58,7 @@ def get_progress_stats():
     # 2. Проверяем, была ли активность СЕГОДНЯ
     today_active = QuizResult.query.filter(
         QuizResult.user_id == user_id,
-        db.func.date(QuizResult.date) == today
+        QuizResult.day == today
     ).first()
     
     # Если сегодня была активность, добавляем +1 к серии
@@ -86,16 +88,16 @@ def get_chart_data():
     user_id = int(get_jwt_identity())
     
     # Данные за последние 30 дней для хорошей визуализации
-    thirty_days_ago = date.today() - timedelta(days=30)
+    thirty_days_ago = clock.today() - timedelta(days=30)
     
     # Получаем дневные результаты (количество очков в день)
     daily_results = db.session.query(
-        func.date(QuizResult.date).label('day'),
+        QuizResult.day,
         func.sum(QuizResult.score).label('total_score')
     ).filter(
         QuizResult.user_id == user_id,
-        QuizResult.date >= thirty_days_ago
-    ).group_by('day').order_by('day').all()
+        QuizResult.day >= thirty_days_ago
+    ).group_by(QuizResult.day).order_by(QuizResult.day).all()
     
     # Форматирование для Chart.js (кумулятивный прогресс)
     date_series = [thirty_days_ago + timedelta(days=i) for i in range(31)]
@@ -107,7 +109,7 @@ def get_chart_data():
     # 1. Рассчитываем начальный кумулятивный счет (до 30 дней)
     initial_learned_count = db.session.query(func.sum(QuizResult.score)).filter(
         QuizResult.user_id == user_id,
-        QuizResult.date < thirty_days_ago
+        QuizResult.day < thirty_days_ago
     ).scalar() or 0
     
     cumulative_score = initial_learned_count
@@ -129,7 +131,7 @@ def get_chart_data():
 @jwt_required()
 def get_progress_history():
     user_id = int(get_jwt_identity())
-    today = date.today()
+    today = clock.today()
     history = []
 
     # последние 14 дней
@@ -141,7 +143,7 @@ def get_progress_history():
 # ❗ ФИНАЛЬНОЕ ИСПРАВЛЕНИЕ 4: Получаем реальный СЧЕТ (score) из QuizResult
         result = QuizResult.query.filter( # <-- ИСПОЛЬЗУЕТ QuizResult
             QuizResult.user_id == user_id,
-            db.func.date(QuizResult.date) == check_day
+            QuizResult.day == check_day
         ).first()
 
 # Значение для графика: 0, если активности не было, или score
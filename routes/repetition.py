@@ -1,14 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import click
 from flask import Blueprint, request, jsonify
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import contains_eager
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import date, timedelta, datetime
+from datetime import datetime, timezone
 from extensions import db
-# ❗ ИМПОРТИРУЕМ QuizResult для записи статистики
-from models import Flashcard, RepetitionSchedule, QuizResult, User
-from utils.sm2 import sm2_update
+from models import Flashcard, RepetitionSchedule, StudySession
+from utils.sm2 import SM2, RELEARN
+from utils.scheduler import STATE_FIELDS, get_scheduler, schedule_state, result_rows, log_reviews
+from utils.decks import ensure_schedules
+from utils.stats import add_quiz_score, counter_deltas, record_counter_delta, fold_counter_deltas
+from utils.pool import init_worker, run_in_app
+from utils.sessions import create_session, session_page, SESSION_PAGE_SIZE, SESSION_PAGE_MAX
+from utils.load_balance import load_balance_enabled, level_due_dates
+from utils import clock
+from utils.daily_queue import (
+    get_daily_queue, consume_cards, due_cards, iter_user_id_chunks, precompute_queues, DAILY_QUEUE_SIZE,
+)
 
 # создаём blueprint
 repetition_bp = Blueprint("repetition", __name__)
 
+# Сколько карточек категории отдаёт /today
+TODAY_CATEGORY_LIMIT = 50
+
+
 # получить карточки на сегодня
 @repetition_bp.route("/today", methods=["GET"])
 @jwt_required()
@@ -16,38 +35,34 @@ def get_today_cards():
     user_id = int(get_jwt_identity())
     category_id = request.args.get('category_id', type=int) 
     
-    today = date.today()
-
-    # 1. Запрос карточек ДЛЯ КОНКРЕТНОЙ КАТЕГОРИИ
-    if category_id is not None:
-        # Мы ищем все карточки, которые принадлежат этой категории и пользователю.
-        # Фильтр по дате повторения (next_review_date <= today) ИГНОРИРУЕТСЯ, 
-        # чтобы пользователь мог учить категорию в любое время.
-        
-        # Получаем Flashcards, которые имеют RepetitionSchedule
-        query = RepetitionSchedule.query.join(Flashcard).filter(
-            RepetitionSchedule.user_id == user_id,
-            Flashcard.category_id == category_id
-        ).order_by(
-            RepetitionSchedule.next_review_date.asc() # Можно оставить сортировку
-        )
-        
-        # Устанавливаем лимит, например, 50 карточек
-        schedules = query.all()
-        
-    # 2. Запрос карточек ПО ОБЩЕМУ РАСПИСАНИЮ (Стандартный режим)
-    else:
-        # Стандартная логика: только карточки, которые пора повторять
-        query = RepetitionSchedule.query.join(Flashcard).filter(
-            RepetitionSchedule.user_id == user_id,
-            RepetitionSchedule.next_review_date <= today,
-        ).order_by(
-            RepetitionSchedule.next_review_date.asc()
-        )
-        schedules = query.limit(200).all()
+    # 1. Общее расписание — из дневной очереди (строится раз в день, без сортировки в SQL)
+    if category_id is None:
+        return jsonify(get_daily_queue(user_id).peek(DAILY_QUEUE_SIZE)), 200
 
+    # Карточки подписанных публичных наборов получают расписание при первой выдаче
+    if ensure_schedules(user_id, category_id=category_id, limit=TODAY_CATEGORY_LIMIT):
+        db.session.commit()
 
-    # 3. Форматирование результата (Общее для обоих случаев)
+    # 2. Запрос карточек ДЛЯ КОНКРЕТНОЙ КАТЕГОРИИ
+    # Мы ищем все карточки, которые принадлежат этой категории и пользователю.
+    # Фильтр по дате повторения (next_review_date <= today) ИГНОРИРУЕТСЯ, 
+    # чтобы пользователь мог учить категорию в любое время.
+    
+    # Получаем Flashcards, которые имеют RepetitionSchedule
+    query = RepetitionSchedule.query.join(Flashcard).options(
+        contains_eager(RepetitionSchedule.flashcard)  # карточка и её текст — в том же запросе
+    ).filter(
+        RepetitionSchedule.user_id == user_id,
+        Flashcard.category_id == category_id
+    ).order_by(
+        RepetitionSchedule.next_review_date.asc() # Можно оставить сортировку
+    )
+    
+    # Первые TODAY_CATEGORY_LIMIT карточек; категорию целиком — через POST /sessions
+    schedules = query.limit(TODAY_CATEGORY_LIMIT).all()
+
+
+    # 3. Форматирование результата
     cards = []
     for schedule in schedules:
         card = schedule.flashcard
@@ -63,6 +78,25 @@ def get_today_cards():
 
 
 # обновить результат по карточке
+# Оценка может сразу вернуть следующие карточки: {"next": N, "exclude": [id, ...]}
+NEXT_CARDS_MAX = 50
+NEXT_EXCLUDE_MAX = 500
+
+
+def _parse_next(data):
+    """(сколько карточек вернуть, id карточек в буфере клиента) или текст ошибки."""
+    try:
+        limit = int(data.get("next") or 0)
+        exclude = [int(card_id) for card_id in data.get("exclude") or []]
+    except (TypeError, ValueError):
+        return "next должен быть числом, exclude — списком id"
+    if not 0 <= limit <= NEXT_CARDS_MAX:
+        return f"next должен быть от 0 до {NEXT_CARDS_MAX}"
+    if len(exclude) > NEXT_EXCLUDE_MAX:
+        return f"Не больше {NEXT_EXCLUDE_MAX} id в exclude"
+    return limit, exclude
+
+
 @repetition_bp.route("/result", methods=["POST"])
 @jwt_required()
 def update_result():
@@ -73,6 +107,10 @@ def update_result():
     user_id = int(get_jwt_identity())
     flashcard_id = data["flashcard_id"]
     quality = int(data["quality"])
+    parsed_next = _parse_next(data)
+    if isinstance(parsed_next, str):
+        return jsonify({"error": parsed_next}), 400
+    next_limit, exclude = parsed_next
 
     schedule = RepetitionSchedule.query.filter_by(
         user_id=user_id, flashcard_id=flashcard_id
@@ -83,106 +121,73 @@ def update_result():
         schedule = RepetitionSchedule(
             flashcard_id=flashcard_id,
             user_id=user_id,
-            next_review_date=date.today(),
+            next_review_date=clock.today(),
             repetitions=0,
             efactor=2.5,
             interval=1
         )
         db.session.add(schedule)
-        db.session.commit()
-        
-        user = User.query.get(user_id)
-    if not user:
-        return jsonify({"error": "Пользователь не найден"}), 404
+        db.session.flush()
 
     # Статус до обновления
-    was_mastered = (schedule.repetitions > 0 and schedule.efactor > 1.3)
+    before = schedule_state([schedule])
     
-    # ПРИМЕНЯЕМ SM2 (это обновит schedule)
-    reps, ef, interval, next_date = sm2_update(
-        schedule.repetitions,
-        schedule.efactor,
-        schedule.interval,
-        quality
-    )
+    # ПРИМЕНЯЕМ алгоритм пользователя (SM-2 или FSRS, это обновит schedule)
+    changes, = result_rows(get_scheduler(user_id, SM2).review(before, [quality]))
+    if load_balance_enabled():
+        (changes["interval"], changes["next_review_date"]), = level_due_dates(
+            user_id, [(flashcard_id, clock.today(), changes["interval"])]
+        )
+    for field in STATE_FIELDS:
+        setattr(schedule, field, changes[field])
+    log_reviews(user_id, [{"flashcard_id": flashcard_id, "quality": quality, "elapsed_days": changes["elapsed_days"]}])
 
-    schedule.repetitions = reps
-    schedule.efactor = ef
-    schedule.interval = interval
-    schedule.next_review_date = next_date
+    # Счётчики пользователя не трогаем в этой транзакции: изменения пишутся
+    # дельтой в user_counter_deltas (без блокировки строки users)
+    studying_delta, learned_delta = counter_deltas(before, schedule_state([schedule]), [quality])
+    record_counter_delta(user_id, int(studying_delta[0]), int(learned_delta[0]))
 
-    # Статус после обновления
-    is_mastered = (reps > 0 and ef > 1.3) # Критерий "Изучено" (Mastered)
-    
-    # 1. Логика для "Изучаю" (studying_count)
-    # Срабатывает, если:
-    #   A) Карточка оценивается как "Не знаю" (quality=0) или "Трудно" (quality < 3)
-    #   B) И это *первое* взаимодействие с карточкой (было repetitions=0)
-    #   C) И она еще не была "Изучаю" (studying_count)
-    # 
-    # Мы упрощаем: если repetitions > 0, считаем, что она уже в "Изучаю" или "Изучено".
-    # Для целей этого счетчика, мы увеличиваем "Изучаю", если repetitions было 0,
-    # и пользователь дал ЛЮБУЮ оценку, КРОМЕ "Знаю" с первой попытки.
-    
-    if schedule.repetitions == 0 and quality < 4:
-        # Это первая попытка и она не "Знаю" -> Переходит в "Изучаю"
-        user.studying_count += 1
-        # Важно: устанавливаем repetitions = 1 после sm2_update
-        
-    # 2. Логика для "Изучено" (learned_count)
-    # Срабатывает, если:
-    #   A) Карточка стала "Изучена" (is_mastered = True)
-    #   B) И она *НЕ* была "Изучена" до этого (was_mastered = False)
-    #   C) Она должна быть удалена из "Изучаю", если она там была.
-    
-    if is_mastered and not was_mastered:
-        # Карточка только что освоена
-        user.learned_count += 1
-        # Если карточка была в "Изучаю" (то есть reps = 1-5, но efactor < 1.3), 
-        # уменьшаем studying_count. 
-        if user.studying_count > 0:
-             user.studying_count -= 1
-    
-    # Если была "Изучено" и стала "Не знаю" (quality < 3)
-    # Сбрасываем ее в "Изучаю"
-    if was_mastered and not is_mastered and quality < 3:
-        user.learned_count = max(0, user.learned_count - 1)
-        user.studying_count += 1
-
-    # ... (старая логика QuizResult)
-    # ----------------------------------------------------------
-    
-    # Один финальный коммит для всех изменений (Schedule + QuizResult + User)
-    db.session.commit()
+    # Активность за сегодня: одна запись QuizResult на день
+    add_quiz_score(user_id, clock.today())
 
-    return jsonify({
+    # Следующие карточки — в той же транзакции, уже с новой датой этой карточки
+    response = {
         "message": "updated",
         "flashcard_id": flashcard_id,
         "next_review_date": str(schedule.next_review_date)
-    }), 200
+    }
+    if next_limit:
+        response["next_cards"] = due_cards(user_id, next_limit, exclude)
+    
+    # Один финальный коммит для всех изменений (Schedule + QuizResult + дельта счётчиков)
+    db.session.commit()
+    consume_cards(user_id, {flashcard_id: schedule.next_review_date})
+
+    return jsonify(response), 200
 
 @repetition_bp.route("/next", methods=["GET"])
 @jwt_required()
 def get_next_cards():
     user_id = int(get_jwt_identity())
     category_id = request.args.get('category_id')
-    
-    print(f"--- DEBUG: Запрос карточек для User {user_id}. Категория: {category_id} ---")
+
+    # Без категории — первые карточки дневной очереди
+    if not (category_id and category_id.isdigit()):
+        return jsonify(get_daily_queue(user_id).peek(20)), 200
+    category_id = int(category_id)
+
+    if ensure_schedules(user_id, category_id=category_id, limit=20):
+        db.session.commit()
 
     query = RepetitionSchedule.query.filter(
         RepetitionSchedule.user_id == user_id,
-        RepetitionSchedule.next_review_date <= date.today()
+        RepetitionSchedule.next_review_date <= clock.today()
     )
 
-    # Присоединяем карточки
-    query = query.join(Flashcard) 
+    # Присоединяем карточки категории
+    query = query.join(Flashcard).filter(Flashcard.category_id == category_id)
 
-    if category_id and category_id.isdigit(): 
-        query = query.filter(Flashcard.category_id == int(category_id))
-        
     schedules = query.order_by(RepetitionSchedule.next_review_date).limit(20).all()
-    
-    print(f"--- DEBUG: Найдено карточек: {len(schedules)} ---")
 
     cards_data = []
     for schedule in schedules:
@@ -198,6 +203,47 @@ def get_next_cards():
     return jsonify(cards_data), 200
 
 
+# Сессия изучения: {"category_id", "due_only", "page_size"} -> id сессии и первая страница.
+# Без категории — карточки, которые пора повторить; с категорией — вся категория
+# (как /today), если не передан due_only.
+@repetition_bp.route("/sessions", methods=["POST"])
+@jwt_required()
+def create_study_session():
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    try:
+        category_id = int(data["category_id"]) if data.get("category_id") is not None else None
+        page_size = int(data.get("page_size", SESSION_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "category_id и page_size должны быть числами"}), 400
+    if not 1 <= page_size <= SESSION_PAGE_MAX:
+        return jsonify({"error": f"page_size должен быть от 1 до {SESSION_PAGE_MAX}"}), 400
+    due_only = bool(data.get("due_only", category_id is None))
+
+    session = create_session(user_id, category_id, due_only, page_size)
+    cards, cursor, done = session_page(session)
+    db.session.commit()
+    return jsonify({"session_id": session.id, "cards": cards, "cursor": cursor, "done": done}), 201
+
+
+# Следующая страница сессии; ?after=<cursor> — повтор страницы после сбоя сети
+@repetition_bp.route("/sessions/<int:session_id>/next", methods=["GET"])
+@jwt_required()
+def next_session_page(session_id):
+    user_id = int(get_jwt_identity())
+    after = request.args.get("after", type=int)
+    if after is not None and after < 0:
+        return jsonify({"error": "Некорректный after"}), 400
+
+    session = StudySession.query.filter_by(id=session_id, user_id=user_id).first()
+    if not session:
+        return jsonify({"error": "Сессия не найдена"}), 404
+
+    cards, cursor, done = session_page(session, after)
+    db.session.commit()
+    return jsonify({"session_id": session.id, "cards": cards, "cursor": cursor, "done": done}), 200
+
+
 # Маршрут для оценки (восстановлен стандартный код SuperMemo)
 @repetition_bp.route("/grade", methods=["POST"])
 @jwt_required()
@@ -206,49 +252,228 @@ def grade_card():
     data = request.json
     card_id = data.get("card_id")
     quality = data.get("quality") # 0-5
+    parsed_next = _parse_next(data)
+    if isinstance(parsed_next, str):
+        return jsonify({"error": parsed_next}), 400
+    next_limit, exclude = parsed_next
 
     schedule = RepetitionSchedule.query.filter_by(flashcard_id=card_id, user_id=user_id).first()
     if not schedule:
         return jsonify({"error": "Schedule not found"}), 404
 
-    # Логика SuperMemo-2
-    if quality >= 3:
-        # Успешное повторение
-        if schedule.repetitions == 0:
-            schedule.interval = 1
-        elif schedule.repetitions == 1:
-            schedule.interval = 6
-        else:
-            schedule.interval = int(schedule.interval * schedule.efactor)
-        
-        schedule.repetitions += 1
-        # Обновляем E-Factor (стандартная формула)
-        schedule.efactor = max(1.3, schedule.efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
-        
-        # Планируем следующее повторение в будущем
-        schedule.next_review_date = date.today() + timedelta(days=schedule.interval)
-
-    else: # quality < 3 (Не знаю / Тяжело)
-        # Неуспешное повторение: сброс, но оставляем доступной СЕГОДНЯ
-        schedule.repetitions = 1 # ❗ Не сбрасываем в 0, чтобы не терять статус "Изучаю"
-        schedule.interval = 1
-        schedule.efactor = max(1.3, schedule.efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
-        # ❗ Карточка доступна сразу
-        schedule.next_review_date = date.today()
-
-    # Проверяем, была ли уже активность сегодня (чтобы не дублировать)
-    today_result = QuizResult.query.filter(
-        QuizResult.user_id == user_id,
-        db.func.date(QuizResult.date) == date.today()
-    ).first()
+    # Алгоритм пользователя (при ошибке карточка остаётся доступной СЕГОДНЯ)
+    changes, = result_rows(get_scheduler(user_id, RELEARN).review(schedule_state([schedule]), [quality]))
+    # Ошибочный ответ (карточка снова сегодня) не сдвигается
+    if load_balance_enabled() and changes["next_review_date"] > clock.today():
+        (changes["interval"], changes["next_review_date"]), = level_due_dates(
+            user_id, [(card_id, clock.today(), changes["interval"])]
+        )
+    for field in STATE_FIELDS:
+        setattr(schedule, field, changes[field])
+    log_reviews(user_id, [{"flashcard_id": card_id, "quality": quality, "elapsed_days": changes["elapsed_days"]}])
 
-    if today_result:
-        # Если запись есть, просто обновляем счетчик очков
-        today_result.score += 1 
-    else:
-        # Если записи нет, создаем новую
-        new_result = QuizResult(user_id=user_id, score=1, date=datetime.utcnow())
-        db.session.add(new_result)
+    # Активность за сегодня: одна запись QuizResult на день
+    add_quiz_score(user_id, clock.today(), 1)
+
+    response = {"message": "Оценка сохранена", "next_date": schedule.next_review_date}
+    if next_limit:
+        response["next_cards"] = due_cards(user_id, next_limit, exclude)
     
     db.session.commit()
-    return jsonify({"message": "Оценка сохранена", "next_date": schedule.next_review_date}), 200
\ No newline at end of file
+    consume_cards(user_id, {card_id: schedule.next_review_date})
+    return jsonify(response), 200
+
+
+# Сколько оценок принимается одним запросом POST /grades
+GRADES_BATCH_MAX = 500
+
+
+def _parse_grade(item):
+    """(card_id, quality, answered_at) из элемента запроса или текст ошибки."""
+    if not isinstance(item, dict):
+        return "Ожидается объект"
+    try:
+        card_id = int(item["card_id"])
+        quality = int(item["quality"])
+    except (KeyError, TypeError, ValueError):
+        return "card_id и quality обязательны"
+    if not 0 <= quality <= 5:
+        return "quality должно быть от 0 до 5"
+
+    answered_at = clock.utcnow()
+    if item.get("answered_at"):
+        try:
+            answered_at = datetime.fromisoformat(str(item["answered_at"]).replace("Z", "+00:00"))
+        except ValueError:
+            return "Некорректный answered_at"
+        if answered_at.tzinfo is not None:
+            answered_at = answered_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # ответ "из будущего" (сбитые часы клиента) считается данным сейчас
+        answered_at = min(answered_at, clock.utcnow())
+    return card_id, quality, answered_at
+
+
+# Пакетная оценка: {"grades": [{"card_id", "quality", "answered_at"}, ...], "next", "exclude"}
+# Оценки применяются по порядку (одна карточка может встречаться несколько раз),
+# все изменения — одной транзакцией.
+@repetition_bp.route("/grades", methods=["POST"])
+@jwt_required()
+def grade_cards():
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    items = data.get("grades")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Передайте список оценок grades"}), 400
+    if len(items) > GRADES_BATCH_MAX:
+        return jsonify({"error": f"Не больше {GRADES_BATCH_MAX} оценок за запрос"}), 400
+    parsed_next = _parse_next(data)
+    if isinstance(parsed_next, str):
+        return jsonify({"error": parsed_next}), 400
+    next_limit, exclude = parsed_next
+
+    errors = []
+    grades = []
+    for index, item in enumerate(items):
+        parsed = _parse_grade(item)
+        if isinstance(parsed, str):
+            errors.append({"index": index, "error": parsed})
+        else:
+            grades.append((index, *parsed))
+
+    # 1. Все расписания пачки — одним SELECT ... FOR UPDATE
+    card_ids = {card_id for _, card_id, _, _ in grades}
+    schedules = {
+        row.flashcard_id: row
+        for row in db.session.query(
+            RepetitionSchedule.id, RepetitionSchedule.flashcard_id,
+            *(getattr(RepetitionSchedule, field) for field in STATE_FIELDS)
+        ).filter(
+            RepetitionSchedule.user_id == user_id,
+            RepetitionSchedule.flashcard_id.in_(card_ids)
+        ).with_for_update()
+    } if card_ids else {}
+
+    # 2. Алгоритм пользователя по порядку ответов. Раунд k — k-е по счёту ответы на каждую
+    #    карточку: внутри раунда карточки различны, поэтому раунд считается одним векторным вызовом.
+    states = {}
+    scores = {}
+    rounds = []
+    seen = {}
+    for index, card_id, quality, answered_at in grades:
+        schedule = schedules.get(card_id)
+        if schedule is None:
+            errors.append({"index": index, "error": "Schedule not found"})
+            continue
+        if card_id not in states:
+            states[card_id] = {"id": schedule.id, **{field: getattr(schedule, field) for field in STATE_FIELDS}}
+        occurrence = seen.get(card_id, 0)
+        seen[card_id] = occurrence + 1
+        if occurrence == len(rounds):
+            rounds.append([])
+        rounds[occurrence].append((card_id, quality, answered_at))
+
+        day = answered_at.date()
+        count, first_answer = scores.get(day, (0, answered_at))
+        scores[day] = (count + 1, min(first_answer, answered_at))
+
+    scheduler = get_scheduler(user_id, RELEARN)
+    answer_days = {}
+    reviews = []
+    for batch in rounds:
+        batch_states = [states[card_id] for card_id, _, _ in batch]
+        result = result_rows(scheduler.review(
+            schedule_state(batch_states),
+            [quality for _, quality, _ in batch],
+            today=np.array([answered_at.date() for _, _, answered_at in batch], dtype="datetime64[D]")
+        ))
+        for (card_id, quality, answered_at), state, changes in zip(batch, batch_states, result):
+            state.update({field: changes[field] for field in STATE_FIELDS})
+            answer_days[card_id] = answered_at.date()
+            reviews.append({
+                "flashcard_id": card_id, "quality": quality,
+                "elapsed_days": changes["elapsed_days"], "reviewed_at": answered_at
+            })
+
+    # Выравнивание нагрузки — только для итоговых дат (после последнего ответа)
+    if load_balance_enabled():
+        passed = [
+            (card_id, answer_days[card_id], state["interval"])
+            for card_id, state in states.items() if state["next_review_date"] > answer_days[card_id]
+        ]
+        for (card_id, _, _), (interval, next_date) in zip(passed, level_due_dates(user_id, passed)):
+            states[card_id]["interval"] = interval
+            states[card_id]["next_review_date"] = next_date
+
+    # 3. Один UPDATE по первичному ключу на все расписания и один коммит
+    if states:
+        db.session.execute(update(RepetitionSchedule), list(states.values()))
+    log_reviews(user_id, reviews)
+    for day, (count, first_answer) in scores.items():
+        add_quiz_score(user_id, day, count, first_answer)
+    next_cards = due_cards(user_id, next_limit, exclude) if next_limit else None
+    db.session.commit()
+    consume_cards(user_id, {card_id: state["next_review_date"] for card_id, state in states.items()})
+
+    response = {
+        "schedules": [
+            {
+                "card_id": card_id,
+                "schedule_id": state["id"],
+                "next_review_date": str(state["next_review_date"]),
+                "repetitions": state["repetitions"],
+                "efactor": state["efactor"],
+                "interval": state["interval"]
+            }
+            for card_id, state in states.items()
+        ],
+        "errors": sorted(errors, key=lambda error: error["index"])
+    }
+    if next_cards is not None:
+        response["next_cards"] = next_cards
+    return jsonify(response), 200
+
+
+# ===================================================
+# 📌 CLI: flask repetition ...
+# ===================================================
+
+@repetition_bp.cli.command("precompute")
+@click.option("--chunk-size", default=500, show_default=True, help="Пользователей в одной пачке (одна транзакция).")
+@click.option("--workers", default=1, show_default=True, help="Число процессов; 1 — без пула.")
+@click.option("--day", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="День очереди (по умолчанию сегодня).")
+def precompute_command(chunk_size, workers, day):
+    """Предрасчёт дневных очередей всех пользователей в таблицу daily_queue.
+
+    Запускать ночью (после полуночи), чтобы утренние /today и /next
+    брали очередь из готового снимка.
+    """
+    day = day.date() if day else clock.today()
+    chunks = iter_user_id_chunks(chunk_size)
+    total = 0
+
+    if workers <= 1:
+        for user_ids in chunks:
+            total += precompute_queues(user_ids, day)
+    else:
+        db.session.remove()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            total = sum(pool.map(run_in_app, repeat(precompute_queues), chunks, repeat(day)))
+
+    click.echo(f"Очереди на {day} рассчитаны для {total} пользователей.")
+
+
+@repetition_bp.cli.command("fold-counters")
+@click.option("--batch-size", default=10000, show_default=True, help="Дельт в одной транзакции.")
+def fold_counters_command(batch_size):
+    """Сворачивает user_counter_deltas в users.studying_count / learned_count.
+
+    Запускать периодически (например, раз в несколько минут): чем меньше
+    несвёрнутых дельт, тем дешевле чтение счётчиков.
+    """
+    total = 0
+    while True:
+        folded = fold_counter_deltas(batch_size)
+        total += folded
+        if folded < batch_size:
+            break
+    click.echo(f"Свёрнуто дельт: {total}.")
@@ -0,0 +1,191 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import BigInteger, Text, and_, func, union_all, select
+from sqlalchemy.orm import join
+from extensions import db
+from models import Flashcard, Category, RepetitionSchedule, CategorySubscription, SyncTombstone, CardContent
+from utils.decks import ADMIN_USER_ID
+
+sync_bp = Blueprint("sync", __name__)
+
+# Сколько изменений каждой сущности отдаётся за один ответ
+SYNC_PAGE_SIZE = 500
+
+# Курсор = XID_CURSOR_BASE + номер транзакции, до которого (включительно) клиент
+# получил все изменения. Курсоры меньше базы (прежние change_seq) — полная синхронизация.
+XID_CURSOR_BASE = 1 << 48
+
+
+def _snapshot_xmin():
+    """Наименьший номер транзакции, которая могла ещё не завершиться.
+
+    Строки, записанные транзакциями с меньшим номером, уже закоммичены
+    (или откатаны), и новых таких строк больше не появится. Номер выдаётся
+    при первой записи, а не при коммите, поэтому изменения с номером >= xmin
+    отдаются только после завершения всех более ранних транзакций — без
+    блокировок у пишущих. Долгая транзакция задерживает синхронизацию, но
+    не теряет изменений.
+    """
+    return db.session.execute(
+        select(func.pg_snapshot_xmin(func.pg_current_snapshot()).cast(Text).cast(BigInteger))
+    ).scalar()
+
+
+def _subscribed_changes(table_cols, join_on, since, user_id, own_xid, from_obj=None):
+    """Изменения сущностей из подписанных публичных наборов.
+
+    Две ветки, каждая идёт по индексу:
+      * новая подписка (её change_xid > since) — весь набор целиком;
+      * старая подписка — только изменённые строки набора.
+    Номер изменения строки = max(xid строки, xid подписки).
+    """
+    xid = func.greatest(own_xid, CategorySubscription.change_xid).label("xid")
+    base = select(*table_cols, xid)
+    if from_obj is not None:
+        base = base.select_from(from_obj)
+    base = base.join(
+        CategorySubscription,
+        and_(join_on, CategorySubscription.user_id == user_id)
+    )
+    return [
+        base.where(CategorySubscription.change_xid > since),
+        base.where(CategorySubscription.change_xid <= since, own_xid > since),
+    ]
+
+
+def _fetch(queries, since, upper, limit=SYNC_PAGE_SIZE):
+    """Выполняет UNION ALL веток, упорядочивая по xid: since < xid <= upper.
+
+    Возвращает (строки, граница): граница — xid первой не вошедшей строки
+    или None, если всё уместилось (limit=None — без ограничения).
+    """
+    union = union_all(*queries).subquery()
+    query = select(union).where(union.c.xid > since, union.c.xid <= upper).order_by(union.c.xid)
+    if limit is None:
+        return db.session.execute(query).all(), None
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit].xid
+    return rows, None
+
+
+def _category_queries(user_id, since):
+    cols = (Category.id, Category.name, Category.level, Category.card_count, Category.user_id)
+    own = select(*cols, Category.change_xid.label("xid")).where(
+        Category.user_id == user_id, Category.change_xid > since
+    )
+    return [own] + _subscribed_changes(
+        cols, CategorySubscription.category_id == Category.id, since, user_id, Category.change_xid
+    )
+
+
+def _flashcard_queries(user_id, since):
+    cols = (Flashcard.id, CardContent.front, CardContent.back, Flashcard.category_id, Flashcard.user_id)
+    with_content = join(Flashcard, CardContent, Flashcard.content_id == CardContent.id)
+    own = select(*cols, Flashcard.change_xid.label("xid")).select_from(with_content).where(
+        Flashcard.user_id == user_id, Flashcard.change_xid > since
+    )
+    return [own] + _subscribed_changes(
+        cols, CategorySubscription.category_id == Flashcard.category_id, since, user_id, Flashcard.change_xid,
+        from_obj=with_content
+    )
+
+
+def _schedule_queries(user_id, since):
+    return [select(
+        RepetitionSchedule.id, RepetitionSchedule.flashcard_id, RepetitionSchedule.next_review_date,
+        RepetitionSchedule.repetitions, RepetitionSchedule.efactor, RepetitionSchedule.interval,
+        RepetitionSchedule.change_xid.label("xid")
+    ).where(
+        RepetitionSchedule.user_id == user_id, RepetitionSchedule.change_xid > since
+    )]
+
+
+def _tombstone_queries(user_id, since):
+    # Удаления публичных карточек (user_id = 0) нужны всем подписчикам
+    return [select(
+        SyncTombstone.entity, SyncTombstone.entity_id, SyncTombstone.change_xid.label("xid")
+    ).where(
+        SyncTombstone.user_id.in_([user_id, ADMIN_USER_ID]), SyncTombstone.change_xid > since
+    )]
+
+
+# Изменения с момента `since`: GET /sync/changes?since=<cursor>
+@sync_bp.route("/changes", methods=["GET"])
+@jwt_required()
+def get_changes():
+    user_id = int(get_jwt_identity())
+    cursor = request.args.get("since", 0, type=int)
+    # Строки, существовавшие до change_xid, имеют 0: полная синхронизация начинается с -1
+    since = cursor - XID_CURSOR_BASE if cursor >= XID_CURSOR_BASE else -1
+    # Отдаём только завершённые транзакции: xid < xmin
+    frozen = _snapshot_xmin() - 1
+
+    sources = {
+        "categories": _category_queries(user_id, since),
+        "flashcards": _flashcard_queries(user_id, since),
+        "schedules": _schedule_queries(user_id, since),
+        "deleted": _tombstone_queries(user_id, since),
+    }
+
+    # 1. Каждая сущность — не больше SYNC_PAGE_SIZE строк
+    results = {}
+    boundaries = []
+    for name, queries in sources.items():
+        rows, boundary = _fetch(queries, since, frozen)
+        results[name] = rows
+        if boundary is not None:
+            boundaries.append(boundary)
+
+    # 2. Если что-то обрезано, курсор = последний xid, полностью вошедший во ВСЕ списки.
+    # Если одна группа с одинаковым xid (одна транзакция, новая подписка) больше
+    # страницы — отдаём её целиком. Иначе клиент получил всё до xmin.
+    has_more = bool(boundaries)
+    if has_more:
+        upper = min(boundaries) - 1
+        if upper <= since:
+            upper = min(boundaries)
+        for name, queries in sources.items():
+            results[name], _ = _fetch(queries, since, upper, limit=None)
+    else:
+        upper = max(since, frozen)
+
+    deleted = {"categories": [], "flashcards": [], "schedules": []}
+    for row in results["deleted"]:
+        deleted[{"category": "categories", "flashcard": "flashcards", "schedule": "schedules"}[row.entity]].append(row.entity_id)
+
+    return jsonify({
+        "cursor": XID_CURSOR_BASE + upper,
+        "has_more": has_more,
+        "categories": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "level": row.level,
+                "card_count": row.card_count,
+                "is_public": row.user_id == ADMIN_USER_ID
+            }
+            for row in results["categories"]
+        ],
+        "flashcards": [
+            {
+                "id": row.id,
+                "front": row.front,
+                "back": row.back,
+                "category_id": row.category_id
+            }
+            for row in results["flashcards"]
+        ],
+        "schedules": [
+            {
+                "id": row.id,
+                "flashcard_id": row.flashcard_id,
+                "next_review_date": str(row.next_review_date),
+                "repetitions": row.repetitions,
+                "efactor": row.efactor,
+                "interval": row.interval
+            }
+            for row in results["schedules"]
+        ],
+        "deleted": deleted
+    }), 200
@@ -0,0 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import click
+from flask.cli import AppGroup
+from extensions import db
+from utils.daily_queue import iter_user_id_chunks
+from utils.pool import init_worker, run_in_app
+from utils.scheduler import fit_users
+
+# Создаем группу команд 'scheduler'
+scheduler_cli = AppGroup('scheduler', help='Spaced repetition scheduler tools.')
+
+
+@scheduler_cli.command('fit')
+@click.option('--chunk-size', default=200, show_default=True, help='Пользователей в одной пачке (один запрос истории).')
+@click.option('--workers', default=1, show_default=True, help='Число процессов; 1 — без пула.')
+@click.option('--steps', default=100, show_default=True, help='Максимум шагов градиентного спуска на пользователя.')
+@click.option('--min-reviews', default=50, show_default=True, help='Минимум ответов в истории для подбора.')
+def fit_command(chunk_size, workers, steps, min_reviews):
+    """Подбирает параметры FSRS каждому пользователю по review_logs.
+
+    Потери и градиент считаются по всем ответам пользователя сразу
+    (NumPy), пачки пользователей раздаются процессам пула. Параметры
+    пишутся в users.fsrs_params и используются, если у пользователя
+    выбран планировщик "fsrs".
+    """
+    chunks = iter_user_id_chunks(chunk_size)
+    total = 0
+
+    if workers <= 1:
+        for user_ids in chunks:
+            total += fit_users(user_ids, steps, min_reviews)
+    else:
+        db.session.remove()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            total = sum(pool.map(run_in_app, repeat(fit_users), chunks, repeat(steps), repeat(min_reviews)))
+
+    click.echo(f"Параметры FSRS подобраны для {total} пользователей.")
@@ -1,8 +1,11 @@
 from datetime import date, datetime
 from flask.cli import AppGroup
-from models import Category, Flashcard, User 
+from models import Category, Flashcard, User, RepetitionSchedule
 from extensions import db
 from sqlalchemy.exc import IntegrityError 
+from utils.decks import reconcile_card_counts
+from utils.catalog import bump_catalog_version
+from utils.content import resolve_content_ids
 
 # Создаем группу команд 'seed'
 seed_cli = AppGroup('seed', help='Database seeding commands.')
@@ -2089,10 +2092,21 @@ def seed_public_categories():
         # 1. Проверка существования и удаление старых данных, если нужно
         existing_category = Category.query.filter_by(name=category_name, level=data['level'], user_id=ADMIN_USER_ID).first()
         
+        existing_cards = {}
         if existing_category:
-            print(f"-> Категория '{category_name}' найдена. Удаляю старые карточки...")
-            # Удаление всех старых карточек для этой категории
-            Flashcard.query.filter_by(user_id=ADMIN_USER_ID, category_id=existing_category.id).delete()
+            print(f"-> Категория '{category_name}' найдена. Синхронизирую карточки...")
+            # На публичные карточки ссылаются расписания подписчиков, поэтому
+            # не пересоздаём набор целиком: удаляем только исчезнувшие карточки.
+            for card in Flashcard.query.filter_by(user_id=ADMIN_USER_ID, category_id=existing_category.id):
+                existing_cards[(card.front, card.back)] = card.id
+
+            wanted = set(data["cards"])
+            stale_ids = [card_id for key, card_id in existing_cards.items() if key not in wanted]
+            if stale_ids:
+                RepetitionSchedule.query.filter(
+                    RepetitionSchedule.flashcard_id.in_(stale_ids)
+                ).delete(synchronize_session=False)
+                Flashcard.query.filter(Flashcard.id.in_(stale_ids)).delete(synchronize_session=False)
             db.session.commit()
             current_category = existing_category
         else:
@@ -2106,12 +2120,19 @@ def seed_public_categories():
             db.session.add(current_category)
             db.session.flush() # Получаем ID категории перед добавлением карточек
 
-        # 3. Добавление карточек
-        cards_added_count = 0
+        # 3. Добавление карточек (тексты — в общую таблицу card_content)
+        new_pairs = []
         for front, back in data["cards"]:
+            if (front, back) in existing_cards:
+                continue
+            existing_cards[(front, back)] = None
+            new_pairs.append((front, back))
+
+        content_ids = resolve_content_ids(new_pairs)
+        cards_added_count = 0
+        for front, back in new_pairs:
             new_card = Flashcard(
-                front=front, 
-                back=back, 
+                content_id=content_ids[(front, back)], 
                 category_id=current_category.id, 
                 user_id=ADMIN_USER_ID 
             )
@@ -2125,9 +2146,23 @@ def seed_public_categories():
             db.session.rollback()
             print(f"-> ❌ Ошибка при добавлении карточек в '{category_name}': {e}")
             
+    # Счётчики карточек публичных наборов приводим к фактическим
+    # и сбрасываем кэш каталога во всех процессах (новая версия → новый ETag)
+    reconcile_card_counts()
+    bump_catalog_version()
+    db.session.commit()
+
     print("\nЗаполнение публичных категорий A1, A2, B1 завершено.")
 
 
+@seed_cli.command('counts')
+def reconcile_category_counts():
+    """Пересчитывает денормализованные Category.card_count (backfill/сверка)."""
+    fixed = reconcile_card_counts()
+    db.session.commit()
+    print(f"-> ✅ Исправлено счётчиков: {fixed}")
+
+
 @seed_cli.command('user')
 def seed_user_categories():
     """Заполняет базу данных тестовыми пользовательскими категориями (для пользователя 2)"""
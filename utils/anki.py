@@ -0,0 +1,104 @@
+import html
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from utils.bulk import BulkParseError
+
+# Файлы коллекции внутри .apkg, от нового формата к старому
+COLLECTION_NAMES = ("collection.anki21", "collection.anki2")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BR_RE = re.compile(r"<br\s*/?>|</div>", re.IGNORECASE)
+_SOUND_RE = re.compile(r"\[sound:[^\]]*\]")
+
+
+def field_text(value):
+    """Текст поля заметки Anki без HTML-разметки и ссылок на медиа."""
+    value = _BR_RE.sub(" ", value)
+    value = _SOUND_RE.sub("", _TAG_RE.sub("", value))
+    return " ".join(html.unescape(value).split())
+
+
+def iter_apkg_rows(path):
+    """Потоково читает колоду Anki (.apkg — zip с SQLite-базой).
+
+    Коллекция распаковывается во временный файл (sqlite3 нужен путь),
+    заметки читаются курсором по одной. Отдаются словари в формате
+    utils.bulk.validate_card_row: front/back — первые два поля заметки,
+    category — имя колоды, состояние повторения — у карточек в повторении.
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise BulkParseError("Файл .apkg повреждён")
+
+    with archive:
+        names = set(archive.namelist())
+        member = next((name for name in COLLECTION_NAMES if name in names), None)
+        if member is None:
+            if "collection.anki21b" in names:
+                raise BulkParseError("Формат Anki 2.1.50+ не поддерживается: экспортируйте колоду в режиме совместимости")
+            raise BulkParseError("В архиве нет коллекции Anki")
+
+        fd, db_path = tempfile.mkstemp(suffix=".anki2")
+        try:
+            with os.fdopen(fd, "wb") as target, archive.open(member) as source:
+                shutil.copyfileobj(source, target)
+            yield from _iter_collection(db_path)
+        finally:
+            os.unlink(db_path)
+
+
+def _iter_collection(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        try:
+            crt, = conn.execute("SELECT crt FROM col").fetchone()
+            decks = _deck_names(conn)
+            # Для заметки берём первую карточку (ord = 0); обратные карточки дублировали бы текст
+            cursor = conn.execute("""
+                SELECT n.flds, c.did, c.type, c.due, c.ivl, c.factor, c.reps
+                FROM notes AS n
+                JOIN cards AS c ON c.nid = n.id
+                AND c.id = (SELECT MIN(id) FROM cards WHERE nid = n.id)
+                ORDER BY n.id
+            """)
+        except sqlite3.DatabaseError as e:
+            raise BulkParseError(f"Некорректная коллекция Anki: {e}")
+
+        collection_start = date.fromtimestamp(crt)
+        for flds, deck_id, card_type, due, ivl, factor, reps in cursor:
+            fields = flds.split("\x1f")
+            item = {
+                "front": field_text(fields[0]),
+                "back": field_text(fields[1]) if len(fields) > 1 else "",
+                "category": decks.get(deck_id, ""),
+            }
+            # type 2 — карточка в повторении: due — номер дня от создания коллекции,
+            # factor — в промилле, ivl — дни
+            if card_type == 2:
+                item.update({
+                    "next_review_date": (collection_start + timedelta(days=due)).isoformat(),
+                    "repetitions": reps,
+                    "efactor": factor / 1000 if factor else 2.5,
+                    "interval": ivl,
+                })
+            yield item
+    finally:
+        conn.close()
+
+
+def _deck_names(conn):
+    """id колоды -> имя; подколоды записываются как "Родитель::Дочерняя"."""
+    try:
+        rows = conn.execute("SELECT id, name FROM decks").fetchall()
+        return {deck_id: name.replace("\x1f", "::") for deck_id, name in rows}
+    except sqlite3.OperationalError:
+        # Старая схема: колоды хранятся JSON-ом в col.decks
+        raw, = conn.execute("SELECT decks FROM col").fetchone()
+        return {int(deck_id): deck["name"] for deck_id, deck in json.loads(raw).items()}
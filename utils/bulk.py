@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+from datetime import date
+from sqlalchemy import insert
+from extensions import db
+from models import Flashcard, RepetitionSchedule
+from utils.content import resolve_content_ids
+from utils import clock
+
+# Сколько строк вставляется одной пачкой (одна транзакция на пачку)
+BULK_BATCH_SIZE = 500
+
+FRONT_BACK_MAX_LEN = 255
+CATEGORY_MAX_LEN = 100
+
+# Необязательное состояние повторения в строке импорта
+# (без next_review_date карточка пора повторить сегодня)
+SCHEDULE_FIELDS = ("next_review_date", "repetitions", "efactor", "interval")
+
+
+# Символы, из которых состоит JSON-число
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+class BulkParseError(ValueError):
+    """Тело запроса не удалось разобрать (битый JSON/CSV)."""
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """Потоково разбирает JSON-массив объектов, не читая тело целиком.
+
+    Элементы отдаются по одному по мере поступления байтов из `stream`.
+    После закрывающей ']' допускаются только пробелы.
+    """
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    buf = ""
+    pos = 0
+    started = False
+    # после элемента нужен ',' или ']', после ',' — элемент
+    after_item = False
+    after_comma = False
+
+    def fill():
+        nonlocal buf, pos
+        try:
+            chunk = reader.read(chunk_size)
+        except UnicodeDecodeError as e:
+            raise BulkParseError(f"Некорректная кодировка: {e}")
+        if not chunk:
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        """Пропускает пробелы, дочитывая поток; False — поток закончился."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not fill():
+                return False
+
+    while True:
+        if not skip_whitespace():
+            raise BulkParseError("Неожиданный конец JSON")
+
+        char = buf[pos]
+        if not started:
+            if char != "[":
+                raise BulkParseError("Ожидается JSON-массив")
+            started = True
+            pos += 1
+            continue
+        if char == "]":
+            if after_comma:
+                raise BulkParseError("Ожидается элемент после ','")
+            pos += 1
+            if skip_whitespace():
+                raise BulkParseError("Лишние данные после JSON-массива")
+            return
+        if char == ",":
+            if not after_item:
+                raise BulkParseError("Лишняя ',' в массиве")
+            after_item, after_comma = False, True
+            pos += 1
+            continue
+        if after_item:
+            raise BulkParseError("Ожидается ',' или ']' между элементами")
+
+        # декодируем очередной элемент, дочитывая поток при необходимости
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise BulkParseError("Некорректный JSON")
+                continue
+            # Число, за которым в буфере только символы числа ("12" из "12345",
+            # "1" из "1.5e3"), может продолжиться в следующем фрагменте
+            if buf[pos] not in NUMBER_CHARS or buf[end:].strip(NUMBER_CHARS) or not fill():
+                break
+        pos = end
+        after_item, after_comma = True, False
+        yield item
+
+
+def iter_csv_rows(stream, delimiter=","):
+    """Потоково читает CSV (front, back[, category[, состояние повторения]])
+    и отдаёт словари.
+
+    Первая строка пропускается, если это заголовок "front,back,...".
+    Колонки после category — next_review_date, repetitions, efactor, interval
+    в порядке utils.export.CSV_COLUMNS.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""), delimiter=delimiter)
+    index = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise BulkParseError(f"Некорректный CSV: {e}")
+        index += 1
+        if index == 1 and row[:2] and [c.strip().lower() for c in row[:2]] == ["front", "back"]:
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+        item = {
+            "front": row[0] if len(row) > 0 else "",
+            "back": row[1] if len(row) > 1 else "",
+            "category": row[2] if len(row) > 2 else "",
+        }
+        item.update(zip(SCHEDULE_FIELDS, row[3:]))
+        yield item
+
+
+def iter_batches(items, size=BULK_BATCH_SIZE):
+    """Группирует поток в пачки по `size` элементов."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_card_row(item):
+    """Возвращает (front, back, category_name, schedule) или текст ошибки.
+
+    schedule — словарь с полями SCHEDULE_FIELDS для RepetitionSchedule
+    или None, если состояние повторения в строке не задано.
+    """
+    if not isinstance(item, dict):
+        return "Ожидается объект"
+    front = str(item.get("front") or "").strip()
+    back = str(item.get("back") or "").strip()
+    category_name = str(item.get("category") or "").strip()
+
+    if not front or not back:
+        return "Заполните обе стороны"
+    if len(front) > FRONT_BACK_MAX_LEN or len(back) > FRONT_BACK_MAX_LEN:
+        return f"Сторона карточки длиннее {FRONT_BACK_MAX_LEN} символов"
+    if len(category_name) > CATEGORY_MAX_LEN:
+        return f"Название категории длиннее {CATEGORY_MAX_LEN} символов"
+
+    schedule = None
+    if any(str(item.get(field) or "").strip() for field in SCHEDULE_FIELDS):
+        review_date = str(item.get("next_review_date") or "").strip()
+        try:
+            schedule = {
+                "next_review_date": date.fromisoformat(review_date) if review_date else clock.today(),
+                "repetitions": int(item.get("repetitions") or 0),
+                "efactor": max(1.3, float(item.get("efactor") or 2.5)),
+                "interval": max(1, int(item.get("interval") or 1)),
+            }
+        except (TypeError, ValueError):
+            return "Некорректное состояние повторения"
+        if schedule["repetitions"] < 0:
+            return "Некорректное состояние повторения"
+    return front, back, category_name, schedule
+
+
+def insert_cards(user_id, rows):
+    """Вставляет пачку карточек и их начальные расписания.
+
+    rows: список словарей с ключами front, back, category_id и
+    необязательным schedule (перекрывает начальное состояние повторения).
+    Тексты разрешаются в card_content пачкой (utils.content), затем две
+    многострочные INSERT-операции (карточки с RETURNING id, расписания)
+    вместо flush() на каждую карточку. Возвращает id карточек в порядке `rows`.
+    """
+    if not rows:
+        return []
+
+    content_ids = resolve_content_ids({(row["front"], row["back"]) for row in rows})
+    card_ids = db.session.execute(
+        insert(Flashcard).returning(Flashcard.id, sort_by_parameter_order=True),
+        [
+            {
+                "content_id": content_ids[(row["front"], row["back"])],
+                "category_id": row["category_id"],
+                "user_id": user_id,
+            }
+            for row in rows
+        ]
+    ).scalars().all()
+
+    today = clock.today()
+    db.session.execute(
+        insert(RepetitionSchedule),
+        [
+            {
+                "flashcard_id": card_id,
+                "user_id": user_id,
+                "next_review_date": today,
+                "repetitions": 0,
+                "efactor": 2.5,
+                "interval": 1,
+                **(row.get("schedule") or {}),
+            }
+            for card_id, row in zip(card_ids, rows)
+        ]
+    )
+    return card_ids
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import Category, CatalogState
+from utils.decks import ADMIN_USER_ID
+
+# Кэш сериализованного каталога на процесс (воркер gunicorn)
+_cache = {"version": None, "body": None, "etag": None}
+_version = {"value": None, "checked_at": 0.0}
+_lock = threading.Lock()
+
+
+def current_catalog_version():
+    """Версия каталога из БД; запрашивается не чаще раза в CATALOG_VERSION_TTL сек."""
+    now = time.monotonic()
+    ttl = current_app.config.get("CATALOG_VERSION_TTL", 5)
+    if _version["value"] is None or now - _version["checked_at"] >= ttl:
+        _version["value"] = db.session.query(CatalogState.version).filter_by(id=1).scalar() or 0
+        _version["checked_at"] = now
+    return _version["value"]
+
+
+def get_public_catalog():
+    """Возвращает (body, etag) публичного каталога.
+
+    JSON собирается один раз на версию каталога; пока версия не
+    изменилась, запрос обслуживается без обращения к таблицам каталога.
+    """
+    version = current_catalog_version()
+    if _cache["version"] == version:
+        return _cache["body"], _cache["etag"]
+
+    with _lock:
+        if _cache["version"] != version:
+            categories = Category.query.filter_by(user_id=ADMIN_USER_ID).order_by(Category.level, Category.name).all()
+            body = json.dumps([
+                {
+                    "id": c.id,
+                    "name": c.name,
+                    "level": c.level,
+                    "card_count": c.card_count
+                }
+                for c in categories
+            ], ensure_ascii=False).encode("utf-8")
+            _cache["body"] = body
+            _cache["etag"] = f"catalog-v{version}-{hashlib.sha1(body).hexdigest()[:16]}"
+            _cache["version"] = version
+        return _cache["body"], _cache["etag"]
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога (вызывать в транзакции изменения каталога)."""
+    db.session.execute(
+        insert(CatalogState).values(id=1, version=1, updated_at=datetime.utcnow()).on_conflict_do_update(
+            index_elements=[CatalogState.id],
+            set_={"version": CatalogState.version + 1, "updated_at": datetime.utcnow()}
+        )
+    )
+    _version["value"] = None
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+# Сдвиг "текущего" времени относительно системных часов (см. use_today)
+_offset = timedelta(0)
+
+
+def today():
+    """Текущий день для расписаний; вместо date.today() во всём коде интервалов."""
+    return date.today() + _offset
+
+
+def utcnow():
+    """Текущее время (UTC) с тем же сдвигом, что и today()."""
+    return datetime.utcnow() + _offset
+
+
+@contextmanager
+def use_today(day):
+    """Подменяет текущий день внутри блока (симуляция, проверки).
+
+    Часы идут дальше, сдвигается только дата: utcnow() внутри блока —
+    то же время суток дня `day`. Значение общее для процесса.
+    """
+    global _offset
+    previous = _offset
+    _offset = day - date.today()
+    try:
+        yield
+    finally:
+        _offset = previous
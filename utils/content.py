@@ -0,0 +1,47 @@
+import hashlib
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import CardContent
+
+
+def content_hash(front, back):
+    """sha256 от (front, back); совпадает с выражением в миграции:
+    sha256(convert_to(front || chr(31) || back, 'UTF8'))."""
+    return hashlib.sha256((front + "\x1f" + back).encode("utf-8")).digest()
+
+
+def resolve_content_ids(pairs):
+    """Возвращает словарь (front, back) -> card_content.id, создавая недостающие.
+
+    SELECT по хэшам всей пачки, затем многострочный
+    INSERT ... ON CONFLICT DO NOTHING RETURNING для новых текстов и
+    повторный SELECT для строк, вставленных конкурентным запросом.
+    """
+    by_hash = {content_hash(front, back): (front, back) for front, back in pairs}
+    if not by_hash:
+        return {}
+
+    found = _select_content_ids(by_hash.keys())
+    missing = [h for h in by_hash if h not in found]
+    if missing:
+        created = db.session.execute(
+            insert(CardContent).on_conflict_do_nothing(
+                index_elements=[CardContent.content_hash]
+            ).returning(CardContent.content_hash, CardContent.id),
+            [{"content_hash": h, "front": by_hash[h][0], "back": by_hash[h][1]} for h in missing]
+        ).all()
+        found.update((bytes(h), content_id) for h, content_id in created)
+        raced = [h for h in missing if h not in found]
+        if raced:
+            found.update(_select_content_ids(raced))
+
+    return {by_hash[h]: content_id for h, content_id in found.items()}
+
+
+def _select_content_ids(hashes):
+    return {
+        bytes(row.content_hash): row.id
+        for row in db.session.query(CardContent.content_hash, CardContent.id).filter(
+            CardContent.content_hash.in_(list(hashes))
+        )
+    }
@@ -0,0 +1,248 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import (
+    Flashcard, CardContent, RepetitionSchedule, SyncTombstone, DailyQueueSnapshot, User, CategorySubscription
+)
+from utils.cache import LRUCache
+from utils.decks import ensure_schedules
+from utils import clock
+
+# Сколько карточек берётся в очередь за одно построение (как лимит /today)
+DAILY_QUEUE_SIZE = 200
+
+# user_id -> DailyQueue, на процесс (воркер)
+_queues = LRUCache(maxsize=2048)
+
+
+class DailyQueue:
+    """Очередь карточек пользователя на сегодня, упорядоченная по next_review_date.
+
+    cards: OrderedDict card_id -> данные карточки (как в ответе /today),
+    поэтому выдача и удаление оценённой карточки — O(1).
+    Свои оценки отражаются сразу (consume_cards); изменения, сделанные
+    через другие воркеры, — после перестроения по истечении expires_at
+    (DAILY_QUEUE_TTL), поэтому выдача из кэша не обращается к БД.
+    """
+
+    def __init__(self, day, expires_at, cards, truncated):
+        self.day = day
+        self.expires_at = expires_at
+        self.cards = cards
+        # в БД есть ещё карточки на сегодня, не вошедшие в очередь
+        self.truncated = truncated
+        self.lock = threading.Lock()
+
+    def peek(self, limit):
+        with self.lock:
+            return [card for _, card in zip(range(limit), self.cards.values())]
+
+
+def _own_version_expr(user_id):
+    """Наибольший change_seq среди строк пользователя: расписаний, своих
+    карточек, подписок и удалений.
+
+    change_seq — глобальная последовательность (routes/sync.py), поэтому
+    любое изменение этих строк её увеличивает. Индексные подзапросы
+    (user_id, change_seq) на одну строку каждый. user_id — значение или колонка.
+    """
+    def latest(column, owner):
+        return select(func.max(column)).where(owner == user_id).scalar_subquery()
+
+    return func.coalesce(func.greatest(
+        latest(RepetitionSchedule.change_seq, RepetitionSchedule.user_id),
+        latest(Flashcard.change_seq, Flashcard.user_id),
+        latest(CategorySubscription.change_seq, CategorySubscription.user_id),
+        latest(SyncTombstone.change_seq, SyncTombstone.user_id)
+    ), 0)
+
+
+def _public_version_expr(user_id):
+    """Наибольший change_seq среди карточек подписанных публичных наборов:
+    по индексу (category_id, change_seq) на каждую подписку."""
+    set_seq = select(func.max(Flashcard.change_seq)).where(
+        Flashcard.category_id == CategorySubscription.category_id
+    ).scalar_subquery()
+    return func.coalesce(
+        select(func.max(set_seq)).where(CategorySubscription.user_id == user_id).scalar_subquery(), 0
+    )
+
+
+def _version_expr(user_id):
+    """Отметка изменений для снимка daily_queue: снимок годен, пока она не выросла.
+
+    Считается только при построении очереди (не чаще раза в DAILY_QUEUE_TTL)
+    и ночным предрасчётом, а не при каждой выдаче.
+    """
+    return func.greatest(_own_version_expr(user_id), _public_version_expr(user_id))
+
+
+def _due_filter(user_id, day):
+    return (RepetitionSchedule.user_id == user_id) & (RepetitionSchedule.next_review_date <= day)
+
+
+# Порядок выдачи карточек; общий для построения на лету и предрасчёта
+DUE_ORDER = (RepetitionSchedule.next_review_date.asc(), RepetitionSchedule.id)
+
+
+def _card_rows(user_id):
+    return db.session.query(
+        RepetitionSchedule.id.label("schedule_id"), Flashcard.id, CardContent.front, CardContent.back,
+        Flashcard.category_id
+    ).join(
+        Flashcard, RepetitionSchedule.flashcard_id == Flashcard.id
+    ).join(
+        CardContent, Flashcard.content_id == CardContent.id
+    ).filter(
+        RepetitionSchedule.user_id == user_id
+    )
+
+
+def _card_json(row):
+    return {
+        "id": row.id,
+        "front": row.front,
+        "back": row.back,
+        "category_id": row.category_id,
+        "schedule_id": row.schedule_id,
+    }
+
+
+def due_cards(user_id, limit, exclude=()):
+    """Первые `limit` карточек к повторению (как в /today), кроме exclude.
+
+    Запрос по индексу (user_id, next_review_date) в текущей транзакции:
+    вызывается после оценки до коммита и видит только что обновлённые даты.
+    """
+    query = _card_rows(user_id).filter(RepetitionSchedule.next_review_date <= clock.today())
+    if exclude:
+        query = query.filter(RepetitionSchedule.flashcard_id.notin_(exclude))
+    return [_card_json(row) for row in query.order_by(*DUE_ORDER).limit(limit)]
+
+
+def _build(user_id, today):
+    # Карточки подписанных публичных наборов получают расписание при первой выдаче
+    if ensure_schedules(user_id, limit=DAILY_QUEUE_SIZE):
+        db.session.commit()
+    expires_at = time.monotonic() + current_app.config.get("DAILY_QUEUE_TTL", 30)
+
+    # 1. Снимок ночного предрасчёта, если строки пользователя с тех пор не менялись:
+    #    выборка по первичным ключам вместо сортировки очереди
+    snapshot = db.session.get(DailyQueueSnapshot, user_id)
+    if (
+        snapshot is not None and snapshot.day == today
+        and snapshot.version == db.session.execute(select(_version_expr(user_id))).scalar()
+    ):
+        found = {
+            row.id: row for row in _card_rows(user_id).filter(
+                RepetitionSchedule.flashcard_id.in_(snapshot.card_ids)
+            )
+        }
+        rows = [found[card_id] for card_id in snapshot.card_ids if card_id in found]
+        truncated = snapshot.due_count > len(snapshot.card_ids)
+    # 2. Иначе — запрос очереди по индексу (user_id, next_review_date)
+    else:
+        rows = _card_rows(user_id).filter(
+            RepetitionSchedule.next_review_date <= today
+        ).order_by(*DUE_ORDER).limit(DAILY_QUEUE_SIZE).all()
+        truncated = len(rows) == DAILY_QUEUE_SIZE
+
+    cards = OrderedDict((row.id, _card_json(row)) for row in rows)
+    return DailyQueue(today, expires_at, cards, truncated)
+
+
+def get_daily_queue(user_id):
+    """Очередь пользователя на сегодня: из кэша или построенная заново.
+
+    Перестраивается при смене дня, по истечении DAILY_QUEUE_TTL и когда
+    исчерпана неполная (усечённая) очередь; иначе — ни одного запроса к БД.
+    """
+    today = clock.today()
+    queue = _queues.get(user_id)
+    if (
+        queue is not None and queue.day == today and time.monotonic() < queue.expires_at
+        and not (queue.truncated and not queue.cards)
+    ):
+        return queue
+
+    queue = _build(user_id, today)
+    _queues.set(user_id, queue)
+    return queue
+
+
+def consume_cards(user_id, next_dates):
+    """Отражает оценки в очереди: next_dates — card_id -> новая next_review_date.
+
+    Вызывается после коммита. Карточка, которую снова пора повторить
+    сегодня (ошибка в /grade), уходит в конец очереди, остальные удаляются.
+    """
+    queue = _queues.get(user_id)
+    if queue is None:
+        return
+    today = clock.today()
+    with queue.lock:
+        for card_id, next_date in next_dates.items():
+            if card_id not in queue.cards:
+                continue
+            if next_date <= today:
+                queue.cards.move_to_end(card_id)
+            else:
+                del queue.cards[card_id]
+
+
+def invalidate_queue(user_id):
+    """Сбрасывает очередь пользователя (карточки добавлены или удалены)."""
+    _queues.pop(user_id)
+
+
+def iter_user_id_chunks(chunk_size):
+    """id пользователей пачками по chunk_size (keyset по users.id, без OFFSET)."""
+    last_id = -1
+    while True:
+        ids = db.session.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def precompute_queues(user_ids, day):
+    """Записывает в daily_queue очереди пачки пользователей на день `day`.
+
+    Сначала досоздаются расписания подписанных наборов (как при первой
+    выдаче), затем один INSERT ... SELECT ... ON CONFLICT DO UPDATE на всю
+    пачку: счётчик и первая страница карточек считаются в БД по индексу
+    (user_id, next_review_date). Возвращает число записанных очередей.
+    """
+    for user_id in user_ids:
+        ensure_schedules(user_id, limit=DAILY_QUEUE_SIZE)
+    db.session.commit()
+
+    due_count = select(func.count()).where(_due_filter(User.id, day)).scalar_subquery()
+    card_ids = func.array(
+        select(RepetitionSchedule.flashcard_id).where(
+            _due_filter(User.id, day)
+        ).order_by(*DUE_ORDER).limit(DAILY_QUEUE_SIZE).scalar_subquery()
+    )
+    stmt = insert(DailyQueueSnapshot).from_select(
+        ["user_id", "day", "version", "due_count", "card_ids", "computed_at"],
+        select(
+            User.id, literal(day), _version_expr(User.id), due_count, card_ids, literal(clock.utcnow())
+        ).where(User.id.in_(user_ids))
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyQueueSnapshot.user_id],
+        set_={
+            name: stmt.excluded[name]
+            for name in ("day", "version", "due_count", "card_ids", "computed_at")
+        }
+    )
+    count = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return count
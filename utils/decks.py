@@ -0,0 +1,225 @@
+from sqlalchemy import any_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import Flashcard, Category, CategorySubscription, RepetitionSchedule
+from utils.cache import LRUCache
+from utils import clock
+
+# Владелец публичного каталога (см. seed_data.py)
+ADMIN_USER_ID = 0
+
+# (user_id, name) -> category_id, на процесс. Инвалидация — forget_category();
+# устаревший id из другого воркера проявится как нарушение FK при вставке карточки.
+_category_ids = LRUCache(maxsize=4096)
+
+
+def subscribed_category_ids(user_id):
+    """Подзапрос: id публичных категорий, на которые подписан пользователь."""
+    return select(CategorySubscription.category_id).where(
+        CategorySubscription.user_id == user_id
+    )
+
+
+def in_subscribed_categories(column, user_id):
+    """column = ANY(ARRAY(подписки пользователя)).
+
+    В отличие от IN (подзапрос) внутри OR, подзапрос выполняется один раз
+    как InitPlan, и обе ветки OR идут по индексам (BitmapOr), а не
+    фильтром по всей таблице.
+    """
+    return column == any_(func.array(subscribed_category_ids(user_id).scalar_subquery()))
+
+
+def accessible_cards_filter(user_id):
+    """Условие "карточка входит в колоду пользователя":
+    собственные карточки + карточки подписанных публичных наборов."""
+    return or_(
+        Flashcard.user_id == user_id,
+        in_subscribed_categories(Flashcard.category_id, user_id)
+    )
+
+
+def resolve_category_id(user_id, name):
+    """id категории пользователя по имени; создаёт её при отсутствии.
+
+    Попадание в кэш — ноль запросов. Промах — SELECT, а для новой
+    категории INSERT ... ON CONFLICT DO NOTHING RETURNING id: при гонке
+    двух запросов побеждает один INSERT, второй перечитывает строку.
+    """
+    return resolve_category_ids(user_id, [name])[name]
+
+
+def resolve_category_ids(user_id, names):
+    """Пакетный вариант resolve_category_id: словарь name -> category_id.
+
+    Не больше трёх запросов на пачку: SELECT промахов кэша, многострочный
+    INSERT ... ON CONFLICT DO NOTHING RETURNING для новых имён и SELECT
+    строк, которые успел вставить конкурентный запрос.
+    """
+    resolved = {}
+    missing = set()
+    for name in names:
+        if not name:
+            continue
+        category_id = _category_ids.get((user_id, name))
+        if category_id is None:
+            missing.add(name)
+        else:
+            resolved[name] = category_id
+
+    if missing:
+        found = _select_category_ids(user_id, missing)
+        new_names = sorted(missing - found.keys())
+        if new_names:
+            found.update(db.session.execute(
+                insert(Category).on_conflict_do_nothing(
+                    constraint="uq_categories_user_name"
+                ).returning(Category.name, Category.id),
+                [{"user_id": user_id, "name": name, "level": "USER", "card_count": 0} for name in new_names]
+            ).all())
+            raced = set(new_names) - found.keys()
+            if raced:
+                found.update(_select_category_ids(user_id, raced))
+        for name, category_id in found.items():
+            _category_ids.set((user_id, name), category_id)
+        resolved.update(found)
+    return resolved
+
+
+def _select_category_ids(user_id, names):
+    return dict(
+        db.session.query(Category.name, Category.id).filter(
+            Category.user_id == user_id, Category.name.in_(names)
+        ).all()
+    )
+
+
+def forget_category(user_id, name):
+    """Убирает категорию из кэша имён (при удалении или устаревшем id)."""
+    _category_ids.pop((user_id, name))
+
+
+def adjust_card_counts(deltas):
+    """Сдвигает Category.card_count на заданные величины.
+
+    deltas: словарь category_id -> изменение (None-ключи игнорируются).
+    Инкремент выполняется на стороне БД, без чтения строки в Python.
+    """
+    for category_id, delta in deltas.items():
+        if category_id is None or not delta:
+            continue
+        db.session.execute(
+            update(Category).where(Category.id == category_id).values(
+                card_count=Category.card_count + delta
+            )
+        )
+
+
+def reconcile_card_counts():
+    """Пересчитывает card_count по таблице flashcards.
+
+    Обновляет только разошедшиеся строки, возвращает их количество.
+    """
+    result = db.session.execute(db.text("""
+        UPDATE categories AS c
+        SET card_count = counts.n
+        FROM (
+            SELECT categories.id, COUNT(flashcards.id) AS n
+            FROM categories
+            LEFT JOIN flashcards ON flashcards.category_id = categories.id
+            GROUP BY categories.id
+        ) AS counts
+        WHERE counts.id = c.id AND c.card_count <> counts.n
+    """))
+    return result.rowcount
+
+
+def clear_category(category_id, delete_cards=False, chunk_size=None, on_progress=None):
+    """Освобождает категорию от карточек перед её удалением.
+
+    delete_cards=False — карточки отвязываются (category_id = NULL),
+    delete_cards=True  — карточки удаляются вместе с расписаниями.
+
+    Без chunk_size это один UPDATE/DELETE ... WHERE category_id = :id
+    в текущей транзакции. С chunk_size работа идёт пачками по id с
+    коммитом после каждой (для фоновых задач): блокировки короткие,
+    прогресс сообщается через on_progress(обработано).
+    """
+    if not chunk_size:
+        return _clear_cards(Flashcard.category_id == category_id, delete_cards)
+
+    done = 0
+    while True:
+        ids = [
+            row.id for row in db.session.query(Flashcard.id).filter(
+                Flashcard.category_id == category_id
+            ).order_by(Flashcard.id).limit(chunk_size)
+        ]
+        if not ids:
+            return done
+        done += _clear_cards(Flashcard.id.in_(ids), delete_cards)
+        db.session.commit()
+        if on_progress:
+            on_progress(done)
+
+
+def _clear_cards(criterion, delete_cards):
+    if not delete_cards:
+        return Flashcard.query.filter(criterion).update(
+            {"category_id": None}, synchronize_session=False
+        )
+    RepetitionSchedule.query.filter(
+        RepetitionSchedule.flashcard_id.in_(select(Flashcard.id).where(criterion))
+    ).delete(synchronize_session=False)
+    return Flashcard.query.filter(criterion).delete(synchronize_session=False)
+
+
+def ensure_schedules(user_id, category_id=None, limit=200):
+    """Лениво создаёт расписания для карточек подписанных наборов.
+
+    Вызывается перед выдачей карточек на повторение: за один вызов
+    материализуется не больше `limit` ещё не запланированных карточек.
+    CategorySubscription.scheduled_through хранит максимальный id уже
+    запланированной карточки, поэтому без новых карточек это один
+    индексный запрос и ноль записей.
+    """
+    query = db.session.query(CategorySubscription.id, Flashcard.id).join(
+        Flashcard, Flashcard.category_id == CategorySubscription.category_id
+    ).filter(
+        CategorySubscription.user_id == user_id,
+        Flashcard.id > CategorySubscription.scheduled_through
+    )
+    if category_id is not None:
+        query = query.filter(CategorySubscription.category_id == category_id)
+
+    pending = query.order_by(Flashcard.id).limit(limit).all()
+    if not pending:
+        return 0
+
+    today = clock.today()
+    db.session.execute(
+        insert(RepetitionSchedule).on_conflict_do_nothing(
+            constraint="uq_repetition_schedule_user_flashcard"
+        ),
+        [
+            {
+                "flashcard_id": card_id,
+                "user_id": user_id,
+                "next_review_date": today,
+                "repetitions": 0,
+                "efactor": 2.5,
+                "interval": 1,
+            }
+            for _, card_id in pending
+        ]
+    )
+
+    # Сдвигаем "водяной знак" каждой затронутой подписки
+    watermarks = {}
+    for subscription_id, card_id in pending:
+        watermarks[subscription_id] = max(card_id, watermarks.get(subscription_id, 0))
+    db.session.execute(
+        update(CategorySubscription),
+        [{"id": sid, "scheduled_through": through} for sid, through in watermarks.items()]
+    )
+    return len(pending)
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import zipfile
+import zlib
+
+# Минимальный размер куска, отдаваемого клиенту (строки копятся до этого порога)
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Колонки CSV; первые три совпадают с форматом импорта (utils.bulk.iter_csv_rows)
+CSV_COLUMNS = ("front", "back", "category", "next_review_date", "repetitions", "efactor", "interval")
+
+
+def export_row_json(row):
+    """Карточка с состоянием повторения (None, если расписания ещё нет)."""
+    return {
+        "id": row.id,
+        "front": row.front,
+        "back": row.back,
+        "category_id": row.category_id,
+        "category": row.name,
+        "next_review_date": row.next_review_date.isoformat() if row.next_review_date else None,
+        "repetitions": row.repetitions,
+        "efactor": row.efactor,
+        "interval": row.interval,
+    }
+
+
+def iter_csv(rows):
+    """Инкрементально кодирует строки в CSV (bytes, UTF-8), кусками ~EXPORT_CHUNK_BYTES."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        item = export_row_json(row)
+        writer.writerow(["" if item[col] is None else item[col] for col in CSV_COLUMNS])
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def iter_ndjson(rows):
+    """По одному JSON-объекту на строку (bytes, UTF-8), кусками ~EXPORT_CHUNK_BYTES."""
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(export_row_json(row), ensure_ascii=False) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    yield "".join(parts).encode("utf-8")
+
+
+def gzip_stream(chunks):
+    """Сжимает поток байтов в gzip на лету (без буферизации всего файла)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 — заголовок gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _StreamBuffer:
+    """Несдвигаемый (unseekable) приёмник для ZipFile: накапливает байты
+    до очередного drain(). ZipFile в этом режиме пишет data descriptor
+    после каждого файла и не возвращается назад по потоку."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def zip_stream(chunks, arcname):
+    """Упаковывает поток байтов в ZIP-архив с одним файлом `arcname` на лету."""
+    buf = _StreamBuffer()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(arcname, "w", force_zip64=True) as member:
+            for chunk in chunks:
+                member.write(chunk)
+                data = buf.drain()
+                if data:
+                    yield data
+    yield buf.drain()
@@ -0,0 +1,159 @@
+import numpy as np
+
+# FSRS (Free Spaced Repetition Scheduler), модель FSRS-4.5.
+# Состояние карточки — стабильность S (дней до падения вероятности
+# вспомнить до 90 %) и сложность D (1–10); 17 параметров w подбираются
+# по истории ответов пользователя (`flask scheduler fit`).
+DEFAULT_PARAMS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+# Допустимые значения параметров (как в оптимизаторе FSRS)
+PARAM_BOUNDS = np.array([
+    (0.1, 100), (0.1, 100), (0.1, 100), (0.1, 100), (1, 10), (0.1, 5), (0.1, 5), (0, 0.75), (0, 4),
+    (0, 0.8), (0.01, 3), (0.5, 5), (0.01, 0.2), (0.01, 0.9), (0.01, 2), (0, 1), (1, 6),
+])
+N_PARAMS = len(DEFAULT_PARAMS)
+
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1
+DESIRED_RETENTION = 0.9
+MAX_INTERVAL = 36500
+
+# Оценки FSRS: 1 — Again, 2 — Hard, 3 — Good, 4 — Easy
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+
+
+def quality_to_rating(quality):
+    """Оценка 0–5 (SM-2) -> оценка FSRS: < 3 — Again, 3 — Hard, 4 — Good, 5 — Easy."""
+    quality = np.asarray(quality, dtype=np.int64)
+    return np.where(quality < 3, AGAIN, np.minimum(quality, 5) - 1)
+
+
+def weights(params, extra_dims=0):
+    """Параметры как массив (17, ...): w[i] транслируется на массивы состояния.
+
+    params — вектор (17,) или пачка (P, 17); для пачки к каждому w[i]
+    добавляется extra_dims осей, чтобы он совпал с состоянием (P, N).
+    """
+    w = np.moveaxis(np.asarray(params, dtype=np.float64), -1, 0)
+    return w.reshape(w.shape + (1,) * extra_dims)
+
+
+def retrievability(elapsed, stability):
+    """Вероятность вспомнить карточку спустя elapsed дней."""
+    return (1 + FACTOR * elapsed / stability) ** DECAY
+
+
+def next_interval(stability, retention=DESIRED_RETENTION):
+    """Интервал (дни), через который вероятность вспомнить падает до retention."""
+    interval = stability / FACTOR * (retention ** (1 / DECAY) - 1)
+    return np.clip(np.rint(interval), 1, MAX_INTERVAL).astype(np.int64)
+
+
+def init_state(w, rating):
+    """(S, D) после первого ответа с оценкой rating."""
+    stability = np.choose(np.asarray(rating) - 1, [w[0], w[1], w[2], w[3]])
+    return stability, _init_difficulty(w, rating)
+
+
+def _init_difficulty(w, rating):
+    return np.clip(w[4] - (rating - 3) * w[5], 1, 10)
+
+
+def step(w, stability, difficulty, elapsed, rating):
+    """Состояние после ответа rating спустя elapsed дней: (S, D, вероятность вспомнить до ответа)."""
+    r = retrievability(elapsed, stability)
+
+    difficulty = difficulty - w[6] * (rating - 3)
+    # возврат к средней сложности (D0 для оценки Good)
+    difficulty = np.clip(w[7] * _init_difficulty(w, GOOD) + (1 - w[7]) * difficulty, 1, 10)
+
+    recalled = stability * (1 + np.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                            * (np.exp((1 - r) * w[10]) - 1)
+                            * np.where(rating == HARD, w[15], 1)
+                            * np.where(rating == EASY, w[16], 1))
+    forgotten = np.minimum(
+        w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * np.exp((1 - r) * w[14]),
+        stability
+    )
+    stability = np.clip(np.where(rating == AGAIN, forgotten, recalled), 0.01, MAX_INTERVAL)
+    return stability, difficulty, r
+
+
+def review_matrices(sequences, max_reviews=64):
+    """История ответов -> матрицы (ratings, elapsed, mask) размера (карточки, max_reviews).
+
+    sequences — по списку (rating, elapsed_days) на карточку в порядке
+    ответов; длинные истории обрезаются до последних max_reviews ответов.
+    """
+    sequences = [seq[-max_reviews:] for seq in sequences if seq]
+    width = max((len(seq) for seq in sequences), default=0)
+    ratings = np.full((len(sequences), width), GOOD, dtype=np.int64)
+    elapsed = np.zeros((len(sequences), width), dtype=np.float64)
+    mask = np.zeros((len(sequences), width), dtype=bool)
+    for row, seq in enumerate(sequences):
+        ratings[row, :len(seq)] = [rating for rating, _ in seq]
+        elapsed[row, :len(seq)] = [days for _, days in seq]
+        mask[row, :len(seq)] = True
+    return ratings, elapsed, mask
+
+
+def log_loss(params, ratings, elapsed, mask):
+    """Средняя логистическая ошибка предсказания "вспомнил/забыл" для пачки параметров.
+
+    params — (P, 17); все карточки и все наборы параметров считаются
+    одновременно, цикл — только по номеру ответа. Первый ответ карточки
+    задаёт начальное состояние, ответы в тот же день (elapsed = 0) не
+    оцениваются. Возвращает массив (P,).
+    """
+    w = weights(params, extra_dims=1)
+    stability, difficulty = init_state(w, ratings[:, 0])
+    losses = np.zeros(len(params))
+    scored = mask[:, 1:] & (elapsed[:, 1:] > 0)
+    for k in range(1, ratings.shape[1]):
+        new_stability, new_difficulty, r = step(w, stability, difficulty, elapsed[:, k], ratings[:, k])
+        recalled = ratings[:, k] > AGAIN
+        r = np.clip(r, 1e-6, 1 - 1e-6)
+        losses -= np.where(scored[:, k - 1], np.where(recalled, np.log(r), np.log(1 - r)), 0).sum(axis=1)
+        # после конца истории карточки состояние не меняется
+        stability = np.where(mask[:, k], new_stability, stability)
+        difficulty = np.where(mask[:, k], new_difficulty, difficulty)
+    return losses / max(int(scored.sum()), 1)
+
+
+def fit_params(ratings, elapsed, mask, steps=100, learning_rate=0.02, initial=DEFAULT_PARAMS, tolerance=1e-5):
+    """Подбирает параметры FSRS градиентным спуском (Adam).
+
+    Параметры нормируются к [0, 1] по PARAM_BOUNDS. Градиент — центральные
+    разности: центр и 2 * 17 сдвинутых наборов параметров считаются одним
+    вызовом log_loss. Останавливается, когда потери 5 шагов подряд не убывают.
+    Возвращает (параметры, потери до, потери после).
+    """
+    low, high = PARAM_BOUNDS[:, 0], PARAM_BOUNDS[:, 1]
+    x = (np.clip(np.asarray(initial, dtype=np.float64), low, high) - low) / (high - low)
+    eps = 1e-4
+    shifts = np.vstack([np.zeros(N_PARAMS), np.eye(N_PARAMS) * eps, -np.eye(N_PARAMS) * eps])
+
+    m = np.zeros(N_PARAMS)
+    v = np.zeros(N_PARAMS)
+    initial_loss = None
+    best, best_loss, stale = x, np.inf, 0
+    for t in range(1, steps + 1):
+        batch = low + np.clip(x + shifts, 0, 1) * (high - low)
+        losses = log_loss(batch, ratings, elapsed, mask)
+        loss = losses[0]
+        if initial_loss is None:
+            initial_loss = loss
+        stale = 0 if loss < best_loss - tolerance else stale + 1
+        if loss < best_loss:
+            best, best_loss = x, loss
+        if stale >= 5:
+            break
+
+        grad = (losses[1:N_PARAMS + 1] - losses[N_PARAMS + 1:]) / (2 * eps)
+        m = 0.9 * m + 0.1 * grad
+        v = 0.999 * v + 0.001 * grad ** 2
+        x = np.clip(x - learning_rate * (m / (1 - 0.9 ** t)) / (np.sqrt(v / (1 - 0.999 ** t)) + 1e-8), 0, 1)
+
+    return low + best * (high - low), float(initial_loss), float(best_loss)
@@ -0,0 +1,128 @@
+import threading
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from models import BackgroundJob
+
+# Задача, которая дольше этого не обновляла updated_at (пульс — каждый
+# report_progress), считается потерянной: воркер, в котором шёл её поток,
+# перезапущен. Такие задачи подхватывает `flask jobs resume`.
+JOB_STALE_AFTER = timedelta(minutes=10)
+
+# kind -> функция задачи target(job_id, *args)
+_targets = {}
+
+
+def job_target(kind):
+    """Регистрирует функцию задачи вида kind (нужно для возобновления по kind).
+
+    Функция должна быть повторяемой: при возобновлении она вызывается
+    снова с теми же аргументами и продолжает с сохранённого прогресса.
+    """
+    def decorator(target):
+        _targets[kind] = target
+        return target
+    return decorator
+
+
+def start_job(kind, user_id, *args, total=None):
+    """Создаёт запись BackgroundJob и запускает задачу вида kind в потоке.
+
+    Поток работает в собственном app context и собственной сессии БД;
+    статус и прогресс пишутся в background_jobs, поэтому их видит любой
+    воркер, а не только запустивший задачу. Аргументы (JSON) сохраняются
+    в записи, чтобы задачу можно было возобновить после перезапуска воркера.
+    """
+    job = BackgroundJob(
+        user_id=user_id, kind=kind, status="pending", progress=0, total=total, args=list(args)
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=_run, args=(app, job.id, _targets[kind], args), daemon=True)
+    thread.start()
+    return job
+
+
+def _run(app, job_id, target, args):
+    with app.app_context():
+        try:
+            _set_job(job_id, status="running")
+            target(job_id, *args)
+            _set_job(job_id, status="done")
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            _set_job(job_id, status="failed", error=str(e))
+        finally:
+            db.session.remove()
+
+
+def _set_job(job_id, **values):
+    stage_progress(job_id, **values)
+    db.session.commit()
+
+
+def stage_progress(job_id, progress=None, total=None, result=None, **values):
+    """Обновляет прогресс задачи в текущей транзакции, без коммита:
+    прогресс фиксируется вместе с работой, которую он описывает."""
+    values["updated_at"] = datetime.utcnow()
+    if progress is not None:
+        values["progress"] = progress
+    if total is not None:
+        values["total"] = total
+    if result is not None:
+        values["result"] = result
+    BackgroundJob.query.filter_by(id=job_id).update(values, synchronize_session=False)
+
+
+def report_progress(job_id, progress, total=None, result=None):
+    """Фиксирует прогресс (и, если передан, промежуточный итог) задачи отдельным коммитом."""
+    _set_job(job_id, progress=progress, total=total, result=result)
+
+
+def resume_stale_jobs(stale_after=JOB_STALE_AFTER):
+    """Возобновляет зависшие задачи (pending/running без пульса дольше stale_after)
+    в текущем процессе, по одной. Возвращает список (id, итоговый статус).
+
+    Задача захватывается одним UPDATE ... WHERE updated_at < порог, поэтому
+    два одновременных запуска не возьмут одну задачу дважды.
+    """
+    app = current_app._get_current_object()
+    resumed = []
+    while True:
+        cutoff = datetime.utcnow() - stale_after
+        job = BackgroundJob.query.filter(
+            BackgroundJob.status.in_(["pending", "running"]), BackgroundJob.updated_at < cutoff
+        ).order_by(BackgroundJob.id).first()
+        if job is None:
+            return resumed
+        claimed = BackgroundJob.query.filter(
+            BackgroundJob.id == job.id, BackgroundJob.status.in_(["pending", "running"]),
+            BackgroundJob.updated_at < cutoff
+        ).update({"status": "running", "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+
+        target = _targets.get(job.kind)
+        if target is None or job.args is None:
+            _set_job(job.id, status="failed", error="Задачу нельзя возобновить")
+        else:
+            _run(app, job.id, target, job.args)
+        db.session.expire_all()
+        resumed.append((job.id, db.session.get(BackgroundJob, job.id).status))
+
+
+def job_json(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "error": job.error,
+        "result": job.result
+    }
@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from models import RepetitionSchedule
+from utils.sm2 import fuzz_days
+
+
+def load_balance_enabled():
+    return current_app.config.get("LOAD_BALANCE", False)
+
+
+def best_offsets(loads, windows):
+    """Сдвиг (дни) наименее загруженного дня окна для каждой карточки.
+
+    loads   : массив (N, 2W + 1) — загрузка дней target - W … target + W
+    windows : массив (N,) — полуширина окна карточки (не больше W)
+    При равной загрузке выбирается сдвиг меньше по модулю, затем более ранний день.
+    """
+    loads = np.asarray(loads, dtype=np.int64)
+    windows = np.asarray(windows, dtype=np.int64)
+    width = (loads.shape[1] - 1) // 2
+    shifts = np.arange(-width, width + 1)
+    score = loads * (4 * width + 2) + np.abs(shifts) * 2 + (shifts > 0)
+    score = np.where(np.abs(shifts) > windows[:, None], np.iinfo(np.int64).max, score)
+    return shifts[np.argmin(score, axis=1)]
+
+
+def _due_counts(user_id, first_day, last_day, exclude_card_ids):
+    """День -> сколько карточек пользователя назначено на него (по индексу user_id, next_review_date)."""
+    query = db.session.query(
+        RepetitionSchedule.next_review_date, func.count()
+    ).filter(
+        RepetitionSchedule.user_id == user_id,
+        RepetitionSchedule.next_review_date.between(first_day, last_day)
+    )
+    if exclude_card_ids:
+        query = query.filter(RepetitionSchedule.flashcard_id.notin_(exclude_card_ids))
+    return Counter(dict(query.group_by(RepetitionSchedule.next_review_date).all()))
+
+
+def level_due_dates(user_id, cards):
+    """Разносит даты повторения по наименее загруженным дням.
+
+    cards — список (card_id, day, interval): карточке, оценённой в день day,
+    назначен интервал interval. Для каждой выбирается день в окне
+    day + interval ± fuzz_days(interval) с наименьшим числом карточек
+    пользователя (при равенстве — ближайший к исходному, затем более ранний).
+    Распределённые карточки сразу учитываются в загрузке, поэтому карточки,
+    выученные вместе, расходятся по окну. Загрузка читается одним запросом.
+    Возвращает список (interval, next_review_date) в порядке cards.
+    """
+    if not cards:
+        return []
+    windows = fuzz_days([interval for _, _, interval in cards])
+    targets = [day + timedelta(days=interval) for _, day, interval in cards]
+    if not windows.any():
+        return [(interval, target) for (_, _, interval), target in zip(cards, targets)]
+
+    load = _due_counts(
+        user_id,
+        min(target - timedelta(days=int(window)) for target, window in zip(targets, windows)),
+        max(target + timedelta(days=int(window)) for target, window in zip(targets, windows)),
+        [card_id for card_id, _, _ in cards]
+    )
+
+    result = []
+    for (_, day, interval), target, window in zip(cards, targets, windows):
+        window = int(window)
+        if window:
+            loads = [[load[target + timedelta(days=shift)] for shift in range(-window, window + 1)]]
+            offset = int(best_offsets(loads, [window])[0])
+            target += timedelta(days=offset)
+            interval += offset
+        load[target] += 1
+        result.append((interval, target))
+    return result
@@ -0,0 +1,24 @@
+from extensions import db
+
+_worker_app = None
+
+
+def init_worker():
+    """initializer для ProcessPoolExecutor: приложение в процессе пула.
+
+    Процесс получает копию приложения; соединения родителя не переиспользуем.
+    """
+    global _worker_app
+    from app import app
+    _worker_app = app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def run_in_app(func, *args):
+    """Вызывает func(*args) в контексте приложения процесса пула (после init_worker)."""
+    with _worker_app.app_context():
+        try:
+            return func(*args)
+        finally:
+            db.session.remove()
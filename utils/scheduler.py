@@ -0,0 +1,227 @@
+from abc import ABC, abstractmethod
+from datetime import date
+import numpy as np
+from itertools import groupby
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import User, ReviewLog
+from utils import fsrs
+from utils.sm2 import SM2, sm2_update_batch
+from utils import clock
+
+# Поля расписания, которые читает и возвращает планировщик
+STATE_FIELDS = (
+    "repetitions", "efactor", "interval", "stability", "difficulty", "last_review_date", "next_review_date",
+)
+SCHEDULERS = ("sm2", "fsrs")
+
+
+def schedule_state(rows):
+    """Состояние пачки расписаний как массивы NumPy (None -> nan / NaT).
+
+    rows — объекты RepetitionSchedule, строки запроса или словари с полями STATE_FIELDS.
+    """
+    def values(field):
+        return [row[field] if isinstance(row, dict) else getattr(row, field) for row in rows]
+
+    return {
+        "repetitions": np.array(values("repetitions"), dtype=np.int64),
+        "efactor": np.array(values("efactor"), dtype=np.float64),
+        "interval": np.array(values("interval"), dtype=np.int64),
+        "stability": np.array(values("stability"), dtype=np.float64),
+        "difficulty": np.array(values("difficulty"), dtype=np.float64),
+        "last_review_date": np.array(values("last_review_date"), dtype="datetime64[D]"),
+        "next_review_date": np.array(values("next_review_date"), dtype="datetime64[D]"),
+    }
+
+
+def result_rows(result):
+    """Результат Scheduler.review -> список словарей с обычными типами Python."""
+    def number(value):
+        return None if np.isnan(value) else float(value)
+
+    return [
+        {
+            "repetitions": int(result["repetitions"][i]),
+            "efactor": float(result["efactor"][i]),
+            "interval": int(result["interval"][i]),
+            "stability": number(result["stability"][i]),
+            "difficulty": number(result["difficulty"][i]),
+            "last_review_date": result["last_review_date"][i].astype(date),
+            "next_review_date": result["next_review_date"][i].astype(date),
+            "elapsed_days": None if np.isnan(result["elapsed_days"][i]) else int(result["elapsed_days"][i]),
+        }
+        for i in range(len(result["repetitions"]))
+    ]
+
+
+def elapsed_days(state, today):
+    """Дней с предыдущего ответа; для старых расписаний без last_review_date —
+    оценка по next_review_date - interval, для новых карточек — nan."""
+    last = np.where(
+        np.isnat(state["last_review_date"]),
+        state["next_review_date"] - state["interval"].astype("timedelta64[D]"),
+        state["last_review_date"]
+    )
+    days = (today - last).astype(np.float64)
+    known = ~np.isnat(state["last_review_date"]) | (state["repetitions"] > 0)
+    return np.where(known, np.maximum(days, 0), np.nan)
+
+
+class Scheduler(ABC):
+    """Алгоритм интервалов. review() обновляет пачку карточек одним векторным вызовом.
+
+    policy — SM2 (POST /repetition/result) или RELEARN (POST /repetition/grade,
+    /grades: при ошибке карточка доступна снова в тот же день).
+    """
+    name = None
+
+    def __init__(self, policy=SM2):
+        self.policy = policy
+
+    @abstractmethod
+    def review(self, state, quality, today=None):
+        """
+        state   : словарь массивов (schedule_state)
+        quality : массив оценок 0–5
+        today   : день ответа — date или массив datetime64[D] (по умолчанию сегодня)
+        Возвращает словарь массивов: поля STATE_FIELDS и elapsed_days.
+        """
+
+
+class SM2Scheduler(Scheduler):
+    name = "sm2"
+
+    def review(self, state, quality, today=None):
+        today = np.asarray(clock.today() if today is None else today, dtype="datetime64[D]")
+        repetitions, efactor, interval, next_review_date = sm2_update_batch(
+            state["repetitions"], state["efactor"], state["interval"], quality, today=today, policy=self.policy
+        )
+        shape = repetitions.shape
+        return {
+            "repetitions": repetitions,
+            "efactor": efactor,
+            "interval": interval,
+            # состояние FSRS после ответа по SM-2 устаревает
+            "stability": np.full(shape, np.nan),
+            "difficulty": np.full(shape, np.nan),
+            "last_review_date": np.broadcast_to(today, shape),
+            "next_review_date": next_review_date,
+            "elapsed_days": elapsed_days(state, today),
+        }
+
+
+class FSRSScheduler(Scheduler):
+    name = "fsrs"
+
+    def __init__(self, policy=SM2, params=None):
+        super().__init__(policy)
+        self.params = np.asarray(params if params is not None else fsrs.DEFAULT_PARAMS, dtype=np.float64)
+
+    def review(self, state, quality, today=None):
+        today = np.asarray(clock.today() if today is None else today, dtype="datetime64[D]")
+        w = fsrs.weights(self.params)
+        rating = fsrs.quality_to_rating(quality)
+        elapsed = elapsed_days(state, today)
+
+        # Карточки без состояния FSRS: новые получают начальное состояние,
+        # уже изучавшиеся по SM-2 — оценку из интервала и E-Factor
+        first = np.isnan(state["stability"]) & np.isnan(elapsed)
+        init_stability, init_difficulty = fsrs.init_state(w, rating)
+        stability = np.where(np.isnan(state["stability"]), np.maximum(state["interval"], 1), state["stability"])
+        difficulty = np.where(
+            np.isnan(state["difficulty"]), np.clip(5 + (2.5 - state["efactor"]) * 4, 1, 10), state["difficulty"]
+        )
+        next_stability, next_difficulty, _ = fsrs.step(
+            w, stability, difficulty, np.nan_to_num(elapsed, nan=0.0), rating
+        )
+        stability = np.where(first, init_stability, next_stability)
+        difficulty = np.where(first, init_difficulty, next_difficulty)
+
+        passed = rating > fsrs.AGAIN
+        interval = fsrs.next_interval(stability)
+        failed_repetitions = 0 if self.policy == SM2 else 1
+        due_in = interval if self.policy == SM2 else np.where(passed, interval, 0)
+        return {
+            "repetitions": np.where(passed, state["repetitions"] + 1, failed_repetitions),
+            "efactor": state["efactor"],
+            "interval": np.where(passed | (self.policy == SM2), interval, 1),
+            "stability": stability,
+            "difficulty": difficulty,
+            "last_review_date": np.broadcast_to(today, stability.shape),
+            "next_review_date": today + due_in.astype("timedelta64[D]"),
+            "elapsed_days": elapsed,
+        }
+
+
+def get_scheduler(user_id, policy=SM2):
+    """Планировщик, выбранный пользователем (users.scheduler), с его параметрами FSRS."""
+    row = db.session.execute(
+        select(User.scheduler, User.fsrs_params).where(User.id == user_id)
+    ).first()
+    if row is not None and row.scheduler == "fsrs":
+        return FSRSScheduler(policy, row.fsrs_params)
+    return SM2Scheduler(policy)
+
+
+def log_reviews(user_id, reviews):
+    """Записывает ответы в review_logs одним INSERT.
+
+    reviews — словари flashcard_id, quality, elapsed_days, reviewed_at.
+    Коммит — на вызывающей стороне.
+    """
+    if reviews:
+        db.session.execute(insert(ReviewLog), [
+            {
+                "user_id": user_id,
+                "flashcard_id": review["flashcard_id"],
+                "quality": review["quality"],
+                "elapsed_days": review["elapsed_days"],
+                "reviewed_at": review.get("reviewed_at") or clock.utcnow(),
+            }
+            for review in reviews
+        ])
+
+
+def _user_sequences(rows):
+    """Строки review_logs одного пользователя (по карточкам, в порядке ответов) ->
+    списки (оценка FSRS, дней с предыдущего ответа) на карточку."""
+    sequences = []
+    for _, card_rows in groupby(rows, key=lambda row: row.flashcard_id):
+        sequence = []
+        previous = None
+        for row in card_rows:
+            day = row.reviewed_at.date()
+            sequence.append((int(fsrs.quality_to_rating(row.quality)), (day - previous).days if previous else 0))
+            previous = day
+        sequences.append(sequence)
+    return sequences
+
+
+def fit_users(user_ids, steps=100, min_reviews=50):
+    """Подбирает параметры FSRS пачке пользователей и сохраняет их в users.fsrs_params.
+
+    История всей пачки читается одним запросом по индексу
+    (user_id, flashcard_id, reviewed_at); пользователи, у которых меньше
+    min_reviews оцениваемых ответов (не первых и не в тот же день),
+    пропускаются. Возвращает число пользователей с новыми параметрами.
+    """
+    rows = db.session.execute(
+        select(ReviewLog.user_id, ReviewLog.flashcard_id, ReviewLog.quality, ReviewLog.reviewed_at).where(
+            ReviewLog.user_id.in_(user_ids)
+        ).order_by(ReviewLog.user_id, ReviewLog.flashcard_id, ReviewLog.reviewed_at)
+    ).all()
+
+    fitted = []
+    for user_id, user_rows in groupby(rows, key=lambda row: row.user_id):
+        ratings, elapsed, mask = fsrs.review_matrices(_user_sequences(user_rows))
+        if (mask[:, 1:] & (elapsed[:, 1:] > 0)).sum() < min_reviews:
+            continue
+        params, _, _ = fsrs.fit_params(ratings, elapsed, mask, steps=steps)
+        fitted.append({"id": user_id, "fsrs_params": [round(float(value), 4) for value in params]})
+
+    if fitted:
+        db.session.execute(update(User), fitted)
+    db.session.commit()
+    return len(fitted)
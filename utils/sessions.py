@@ -0,0 +1,98 @@
+from datetime import timedelta
+from sqlalchemy import delete, func, select
+from extensions import db
+from models import Flashcard, CardContent, RepetitionSchedule, StudySession
+from utils import clock
+from utils.decks import ensure_schedules
+
+# Карточек на странице сессии: по умолчанию и максимум
+SESSION_PAGE_SIZE = 50
+SESSION_PAGE_MAX = 100
+# Сколько строк индекса просматривает один запрос страницы: если подходящих
+# карточек мало, страница может быть короче page_size, но запрос остаётся дешёвым
+SESSION_SCAN_MAX = 1000
+# Сессии старше этого срока удаляются при создании новой
+SESSION_TTL = timedelta(days=7)
+
+
+def create_session(user_id, category_id=None, due_only=True, page_size=SESSION_PAGE_SIZE):
+    """Создаёт сессию со снимком: день и наибольший id карточки на момент создания."""
+    db.session.execute(delete(StudySession).where(
+        StudySession.user_id == user_id, StudySession.created_at < clock.utcnow() - SESSION_TTL
+    ))
+    session = StudySession(
+        user_id=user_id,
+        category_id=category_id,
+        due_only=due_only,
+        day=clock.today(),
+        max_flashcard_id=db.session.execute(select(func.coalesce(func.max(Flashcard.id), 0))).scalar(),
+        cursor=0,
+        page_size=page_size,
+        created_at=clock.utcnow()
+    )
+    db.session.add(session)
+    db.session.flush()
+    return session
+
+
+def _scan(session, after):
+    """Следующие SESSION_SCAN_MAX id карточек сессии после after — по индексу
+    (category_id, id) карточек категории или (user_id, flashcard_id) расписаний."""
+    if session.category_id is not None:
+        column = Flashcard.id
+        criteria = [Flashcard.category_id == session.category_id]
+    else:
+        column = RepetitionSchedule.flashcard_id
+        criteria = [RepetitionSchedule.user_id == session.user_id]
+    return select(column.label("flashcard_id")).where(
+        *criteria, column > after, column <= session.max_flashcard_id
+    ).order_by(column).limit(SESSION_SCAN_MAX).cte("scan")
+
+
+def session_page(session, after=None):
+    """Следующая страница сессии: (карточки, новый курсор, сессия пройдена).
+
+    Карточки идут по flashcard_id после курсора (по умолчанию — сохранённого
+    в сессии); курсор в сессии сдвигается, коммит — на вызывающей стороне.
+    """
+    after = session.cursor if after is None else after
+    # Карточки подписанных наборов получают расписание до того, как до них дойдёт курсор
+    ensure_schedules(session.user_id, category_id=session.category_id, limit=SESSION_SCAN_MAX)
+
+    scan = _scan(session, after)
+    query = db.session.query(
+        RepetitionSchedule.id.label("schedule_id"), Flashcard.id, CardContent.front, CardContent.back,
+        Flashcard.category_id
+    ).select_from(scan).join(
+        RepetitionSchedule,
+        (RepetitionSchedule.user_id == session.user_id) & (RepetitionSchedule.flashcard_id == scan.c.flashcard_id)
+    ).join(
+        Flashcard, Flashcard.id == scan.c.flashcard_id
+    ).join(
+        CardContent, Flashcard.content_id == CardContent.id
+    )
+    if session.due_only:
+        query = query.filter(RepetitionSchedule.next_review_date <= session.day)
+    rows = query.order_by(scan.c.flashcard_id).limit(session.page_size).all()
+
+    if len(rows) == session.page_size:
+        cursor, done = rows[-1].id, False
+    else:
+        # Страница неполная: просмотренный отрезок исчерпан, курсор — в его конец
+        scanned, last_id = db.session.execute(
+            select(func.count(), func.max(scan.c.flashcard_id))
+        ).first()
+        cursor, done = (last_id or after), scanned < SESSION_SCAN_MAX
+
+    session.cursor = cursor
+    cards = [
+        {
+            "id": row.id,
+            "front": row.front,
+            "back": row.back,
+            "category_id": row.category_id,
+            "schedule_id": row.schedule_id,
+        }
+        for row in rows
+    ]
+    return cards, cursor, done
@@ -1,4 +1,75 @@
-from datetime import date, timedelta
+from datetime import date
+import numpy as np
+from utils import clock
+
+# Политики обновления:
+#   SM2     — классический SM-2 (POST /repetition/result): round(), сброс в 0;
+#   RELEARN — вариант POST /repetition/grade: int(), при ошибке repetitions = 1
+#             и карточка доступна снова в тот же день.
+SM2 = "sm2"
+RELEARN = "relearn"
+
+
+def sm2_update_batch(repetitions, efactor, interval, quality, today=None, policy=SM2):
+    """
+    Векторный SM-2: обновляет сразу массив карточек.
+    repetitions : массив int — сколько раз уже повторяли
+    efactor     : массив float — фактор сложности
+    interval    : массив int — текущий интервал (в днях)
+    quality     : массив int — оценка (0–5)
+    today       : день ответа — date или массив datetime64[D] (по умолчанию сегодня)
+    policy      : SM2 или RELEARN
+    Возвращает массивы (repetitions, efactor, interval, next_review_date[datetime64[D]]).
+    """
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    efactor = np.asarray(efactor, dtype=np.float64)
+    interval = np.asarray(interval, dtype=np.int64)
+    quality = np.asarray(quality, dtype=np.int64)
+    today = np.asarray(clock.today() if today is None else today, dtype="datetime64[D]")
+
+    passed = quality >= 3
+
+    # интервал при успехе считается по E-Factor до обновления
+    grown = interval * efactor
+    grown = np.rint(grown) if policy == SM2 else np.trunc(grown)
+    new_interval = np.where(repetitions == 0, 1, np.where(repetitions == 1, 6, grown.astype(np.int64)))
+    new_interval = np.where(passed, new_interval, 1)
+
+    failed_repetitions = 0 if policy == SM2 else 1
+    new_repetitions = np.where(passed, repetitions + 1, failed_repetitions)
+
+    new_efactor = np.maximum(1.3, efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+
+    # RELEARN: неуспешная карточка доступна сегодня же
+    due_in = new_interval if policy == SM2 else np.where(passed, new_interval, 0)
+    next_review_date = today + due_in.astype("timedelta64[D]")
+    return new_repetitions, new_efactor, new_interval, next_review_date
+
+
+# Ширина окна выравнивания нагрузки: доля интервала по его длине
+# (интервал до FUZZ_STEPS[i][0] дней -> ±FUZZ_STEPS[i][1] от интервала)
+FUZZ_STEPS = ((7, 0.15), (20, 0.10))
+FUZZ_LONG = 0.05
+
+
+def fuzz_days(interval):
+    """
+    Полуширина окна (в днях), в котором можно сдвинуть дату повторения.
+    interval : массив int — новый интервал
+    Интервалы короче 3 дней не сдвигаются, остальные — хотя бы на день.
+    """
+    interval = np.asarray(interval, dtype=np.int64)
+    share = np.full(interval.shape, FUZZ_LONG)
+    for limit, value in reversed(FUZZ_STEPS):
+        share = np.where(interval < limit, value, share)
+    days = np.maximum(1, np.rint(interval * share)).astype(np.int64)
+    return np.where(interval < 3, 0, days)
+
+
+def _scalar(result):
+    repetitions, efactor, interval, next_review_date = result
+    return int(repetitions[0]), float(efactor[0]), int(interval[0]), next_review_date[0].astype(date)
+
 
 def sm2_update(repetitions, efactor, interval, quality):
     """
@@ -7,23 +78,19 @@ def sm2_update(repetitions, efactor, interval, quality):
     efactor     : фактор сложности (обычно 2.5)
     interval    : текущий интервал (в днях)
     quality     : оценка (0–5)
+    Одна карточка через sm2_update_batch.
+    """
+    return _scalar(sm2_update_batch([repetitions], [efactor], [interval], [quality], policy=SM2))
+
+
+def sm2_relearn_update(repetitions, efactor, interval, quality, today=None):
+    """
+    Вариант SM-2, которым пользуется POST /repetition/grade (политика RELEARN).
+    Отличия от sm2_update:
+      * интервал округляется вниз (int), а не round();
+      * при quality < 3 repetitions = 1 (карточка остаётся в "Изучаю")
+        и карточка доступна снова в тот же день.
+    today : день ответа (по умолчанию — сегодня)
     """
+    return _scalar(sm2_update_batch([repetitions], [efactor], [interval], [quality], today=today, policy=RELEARN))
 
-    if quality < 3:
-        repetitions = 0
-        interval = 1
-    else:
-        if repetitions == 0:
-            interval = 1
-        elif repetitions == 1:
-            interval = 6
-        else:
-            interval = round(interval * efactor)
-        repetitions += 1
-
-    efactor = efactor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-    if efactor < 1.3:
-        efactor = 1.3
-
-    next_review_date = date.today() + timedelta(days=interval)
-    return repetitions, efactor, interval, next_review_date
@@ -0,0 +1,124 @@
+import numpy as np
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from extensions import db
+from models import QuizResult, User, UserCounterDelta
+from utils import clock
+
+
+def add_quiz_score(user_id, day, count=1, answered_at=None):
+    """Добавляет `count` очков к записи QuizResult пользователя за день `day`.
+
+    Один INSERT ... ON CONFLICT (user_id, day) DO UPDATE SET score = score + n:
+    без чтения строки в Python, поэтому одновременные оценки с двух
+    устройств не теряют очки. Коммит — на вызывающей стороне.
+    """
+    stmt = insert(QuizResult).values(
+        user_id=user_id, day=day, score=count, date=answered_at or clock.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        constraint="uq_quiz_results_user_day",
+        set_={"score": QuizResult.score + stmt.excluded.score}
+    ))
+
+
+def counter_deltas(before, after, quality):
+    """Изменения счётчиков "Изучаю"/"Изучено" после ответов (POST /repetition/result).
+
+    before, after — состояния расписаний до и после ответа (schedule_state),
+    quality — оценки; возвращает массивы (studying, learned) по карточкам.
+    Одна функция и для маршрута, и для `flask bench simulate`.
+    """
+    quality = np.asarray(quality)
+    # Статус до обновления; в "Изучаю" карточка, на которую уже отвечали,
+    # но ещё не освоенная — новая карточка (ответов не было) в счётчике не учтена
+    was_mastered = (before["repetitions"] > 0) & (before["efactor"] > 1.3)
+    was_studying = ~was_mastered & ((before["repetitions"] > 0) | ~np.isnat(before["last_review_date"]))
+    # Статус после обновления — критерий "Изучено" (Mastered)
+    is_mastered = (after["repetitions"] > 0) & (after["efactor"] > 1.3)
+
+    # 1. Логика для "Изучаю" (studying_count)
+    # Срабатывает, если:
+    #   A) Карточка оценивается как "Не знаю" (quality=0) или "Трудно" (quality < 3)
+    #   B) И это *первое* взаимодействие с карточкой (было repetitions=0)
+    #   C) И она еще не была "Изучаю" (studying_count)
+    #
+    # Мы упрощаем: если repetitions > 0, считаем, что она уже в "Изучаю" или "Изучено".
+    # Для целей этого счетчика, мы увеличиваем "Изучаю", если repetitions было 0,
+    # и пользователь дал ЛЮБУЮ оценку, КРОМЕ "Знаю" с первой попытки.
+    studying = ((after["repetitions"] == 0) & (quality < 4)).astype(np.int64)
+
+    # 2. Логика для "Изучено" (learned_count)
+    # Срабатывает, если:
+    #   A) Карточка стала "Изучена" (is_mastered = True)
+    #   B) И она *НЕ* была "Изучена" до этого (was_mastered = False)
+    #   C) Она должна быть удалена из "Изучаю", если она там была.
+    mastered = is_mastered & ~was_mastered
+    learned = mastered.astype(np.int64)
+    studying -= mastered & was_studying
+
+    # Если была "Изучено" и стала "Не знаю" (quality < 3)
+    # Сбрасываем ее в "Изучаю"
+    lost = was_mastered & ~is_mastered & (quality < 3)
+    learned -= lost
+    studying += lost
+    return studying, learned
+
+
+def record_counter_delta(user_id, studying=0, learned=0):
+    """Дописывает изменение счётчиков пользователя (без UPDATE строки users).
+
+    Обычный INSERT в user_counter_deltas: одновременные оценки не ждут
+    блокировку строки users. Коммит — на вызывающей стороне.
+    """
+    if not studying and not learned:
+        return
+    db.session.execute(insert(UserCounterDelta).values(
+        user_id=user_id, studying_delta=studying, learned_delta=learned
+    ))
+
+
+def user_counters(user_id):
+    """(studying_count, learned_count): значения из users плюс несвёрнутые дельты.
+
+    Один запрос; дельты читаются по индексу user_id, их немного, если
+    `flask repetition fold-counters` запускается регулярно.
+    """
+    def delta_sum(column):
+        return select(func.coalesce(func.sum(column), 0)).where(
+            UserCounterDelta.user_id == user_id
+        ).scalar_subquery()
+
+    row = db.session.execute(
+        select(
+            func.greatest(0, User.studying_count + delta_sum(UserCounterDelta.studying_delta)),
+            func.greatest(0, User.learned_count + delta_sum(UserCounterDelta.learned_delta))
+        ).where(User.id == user_id)
+    ).first()
+    return (int(row[0]), int(row[1])) if row else (0, 0)
+
+
+def fold_counter_deltas(limit=10000):
+    """Сворачивает до `limit` самых старых дельт в users и удаляет их.
+
+    Один запрос: DELETE ... RETURNING внутри CTE, суммы по пользователю и
+    UPDATE users. Счётчики не опускаются ниже нуля. Возвращает число
+    свёрнутых дельт.
+    """
+    batch = select(UserCounterDelta.id).order_by(UserCounterDelta.id).limit(limit).scalar_subquery()
+    removed = delete(UserCounterDelta).where(UserCounterDelta.id.in_(batch)).returning(
+        UserCounterDelta.user_id, UserCounterDelta.studying_delta, UserCounterDelta.learned_delta
+    ).cte("removed")
+    sums = select(
+        removed.c.user_id,
+        func.sum(removed.c.studying_delta).label("studying"),
+        func.sum(removed.c.learned_delta).label("learned"),
+        func.count().label("deltas")
+    ).group_by(removed.c.user_id).cte("sums")
+    updated = update(User).where(User.id == sums.c.user_id).values(
+        studying_count=func.greatest(0, User.studying_count + sums.c.studying),
+        learned_count=func.greatest(0, User.learned_count + sums.c.learned)
+    ).returning(sums.c.deltas).cte("updated")
+    folded = db.session.execute(select(func.coalesce(func.sum(updated.c.deltas), 0))).scalar()
+    db.session.commit()
+    return int(folded)